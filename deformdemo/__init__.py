@@ -6,21 +6,26 @@ capabilities and which provides a functional test suite  """
 # Standard Library
 import csv
 import decimal
-import inspect
+import functools
 import logging
-import pprint
 import random
 import sys
 
 # Pyramid
 import colander
 from pyramid.config import Configurator
+from pyramid.events import NewResponse
+from pyramid.httpexceptions import HTTPBadRequest
+from pyramid.httpexceptions import HTTPNotFound
+from pyramid.httpexceptions import HTTPNotModified
 from pyramid.i18n import TranslationStringFactory
 from pyramid.i18n import get_locale_name
 from pyramid.i18n import get_localizer
 from pyramid.renderers import get_renderer
+from pyramid.response import FileResponse
 from pyramid.response import Response
 from pyramid.session import UnencryptedCookieSessionFactoryConfig
+from pyramid.settings import asbool
 from pyramid.threadlocal import get_current_request
 from pyramid.view import view_config
 from pyramid.view import view_defaults
@@ -30,9 +35,36 @@ import deform
 from deform.renderer import configure_zpt_renderer
 
 from iso8601 import iso8601
-from pygments import highlight
 from pygments.formatters import HtmlFormatter
-from pygments.lexers import PythonLexer
+
+# Deform Demo
+from deformdemo.assets import FAR_FUTURE
+from deformdemo.assets import SHORT_MAX_AGE
+from deformdemo.assets import ContentHashCacheBuster
+from deformdemo.assets import FingerprintedAsset
+from deformdemo.assets import PrecompressedStaticView
+from deformdemo.assets import ResourceBundler
+from deformdemo.assets import cache_busted_forever
+from deformdemo.caching import FormPrototype
+from deformdemo.caching import LRUCache
+from deformdemo.caching import fingerprint
+from deformdemo.captured import CapturedFormatter
+from deformdemo.partial import find_field
+from deformdemo.partial import render_partial
+from deformdemo.partial import validate_subtree
+from deformdemo.partial import wants_partial
+from deformdemo.profiling import ProfileStore
+from deformdemo.profiling import token_matches
+from deformdemo.source import SourceCache
+from deformdemo.source import SourceListing
+from deformdemo.streaming import StreamedForm
+from deformdemo.streaming import stream_form
+from deformdemo.timing import NULL_TIMER
+from deformdemo.timing import PhaseTimer
+from deformdemo.timing import TimingStats
+from deformdemo.timing import add_server_timing
+from deformdemo.timing import timer
+from deformdemo.tmpstore import make_tmpstore
 
 
 log = logging.getLogger(__name__)
@@ -56,32 +88,110 @@ _ = TranslationStringFactory("deformdemo")
 formatter = HtmlFormatter(nowrap=True)
 css = formatter.get_style_defs()
 
+# served under a name that changes with its content; see cssasset
+css_asset = FingerprintedAsset(
+    "pygments-%s.css", css.encode("utf-8"), "text/css"
+)
+
+# highlighted source of each demo, shown below its form
+code_cache = SourceCache(formatter)
+
+# highlighted source of this whole module, shown by the allcode view
+code_listing = SourceListing(sys.modules[__name__], formatter)
+
 # the zpt_renderer above is referred to within the demo.ini file by dotted name
 
 
+#: Maps the view name of every demo to its title; filled by ``demonstrate``
+demo_titles = {}
+
+#: View names of the demos whose form depends on the request or the date,
+#: or whose rendering has side effects (the read-only file upload widget
+#: fills the tmpstore); their forms are built and rendered on every request
+dynamic_demos = set()
+
+#: View names of the demos whose ``success`` callback does not depend on the
+#: request it was made for, so that the arguments to render_form recorded
+#: with their prototype may be used again on later requests
+replayable_demos = set()
+
+#: Largest number of items a stress demo renders
+MAX_STRESS_ITEMS = 10000
+
+
 class demonstrate(object):
-    def __init__(self, title):
+    def __init__(self, title, dynamic=False, replay_success=False):
         self.title = title
+        self.dynamic = dynamic
+        self.replay_success = replay_success
 
     def __call__(self, method):
+        name = method.__name__
         method.demo = self.title
-        return method
-
-
-# Py2/Py3 compat
-# http://stackoverflow.com/a/16888673/315168
-# eliminate u''
-def my_safe_repr(obj, context, maxlevels, level):
-    if type(obj) == unicode:
-        obj = obj.encode("utf-8")
-    return pprint._safe_repr(obj, context, maxlevels, level)
+        demo_titles[name] = self.title
+        if self.dynamic:
+            dynamic_demos.add(name)
+            return method
+        if self.replay_success:
+            replayable_demos.add(name)
+
+        @functools.wraps(method)
+        def view(inst):
+            # after the first request, skip building the schema and form
+            prototype = inst.request.registry.form_prototypes.get(name)
+            if prototype is None or prototype[1] is None:
+                return method(inst)
+            form, kw = prototype
+            return inst.render_form(form.clone(), **kw)
+
+        # functools.wraps only sets this on Python 3; get_code follows it to
+        # show the demo's own source
+        view.__wrapped__ = method
+        return view
+
+
+def collect_demos():
+    """ Return a sorted list of ``(title, name, url)`` tuples, one for each
+    method decorated with :class:`demonstrate`.  ``url`` is relative to the
+    application root."""
+    L = [(title, name, name + "/") for name, title in demo_titles.items()]
+    L.sort()
+    return L
+
+
+main_macros = None
+
+
+def get_main_macros(request):
+    """ Return the macros of ``templates/main.pt``.  They are resolved once
+    per process, or on every call when ``reload_templates`` is on."""
+    global main_macros
+    macros = main_macros
+    if macros is None or request.registry.settings.get("reload_templates"):
+        renderer = get_renderer("templates/main.pt")
+        macros = main_macros = renderer.implementation().macros
+    return macros
 
 
 @view_defaults(route_name="deformdemo")
 class DeformDemo(object):
     def __init__(self, request):
         self.request = request
-        self.macros = get_renderer("templates/main.pt").implementation().macros
+        # render_form times the phases of the request from here
+        self.started = None
+        if request.registry.timing_stats is not None:
+            self.started = timer()
+
+    css_name = css_asset.name
+
+    @property
+    def macros(self):
+        return get_main_macros(self.request)
+
+    @property
+    def tmpstore(self):
+        # the store of uploaded files of this application, see main()
+        return self.request.registry.tmpstore
 
     def render_form(
         self,
@@ -95,37 +205,80 @@ class DeformDemo(object):
 
         captured = None
 
+        name = self.request.view_name
+        if name in demo_titles and name not in dynamic_demos:
+            self.record_prototype(
+                name,
+                form,
+                appstruct=appstruct,
+                submitted=submitted,
+                success=success,
+                readonly=readonly,
+                is_i18n=is_i18n,
+            )
+
+        # building the schema and the form happens before render_form is
+        # called; see deformdemo.timing
+        if self.started is None:
+            phases = NULL_TIMER
+        else:
+            phases = self.request.phases = PhaseTimer(self.started)
+        phases.mark("build")
+
         if submitted in self.request.POST:
             # the request represents a form submission
             try:
                 # try to validate the submitted values
                 controls = self.request.POST.items()
                 captured = form.validate(controls)
+                phases.mark("validate")
                 if success:
                     response = success()
                     if response is not None:
                         return response
+                if wants_partial(self.request):
+                    return render_partial(form, True)
                 html = form.render(captured)
             except deform.ValidationFailure as e:
                 # the submitted values could not be validated
+                phases.mark("validate")
+                if wants_partial(self.request):
+                    return render_partial(e.field, False)
                 html = e.render()
+            phases.mark("render")
+
+        elif self.request.registry.stream_pages and not self.request.is_xhr:
+            # the page is sent while the form is rendered, see stream_form
+            streamed = StreamedForm(
+                self.request,
+                functools.partial(
+                    self.render_fragment, form, appstruct, readonly
+                ),
+            )
+            self.request.streamed_form = streamed
+            html = streamed.marker
 
         else:
             # the request requires a simple form rendering
-            html = form.render(appstruct, readonly=readonly)
+            html = self.render_fragment(form, appstruct, readonly)
+            phases.mark("render")
 
         if self.request.is_xhr:
             return Response(html)
 
-        code, start, end = self.get_code(2)
+        code, start, end = self.get_code()
+        phases.mark("code")
+
+        captured = self.request.registry.captured_formatter(captured)
+        phases.mark("captured")
+
         locale_name = get_locale_name(self.request)
 
         reqts = form.get_widget_resources()
-
-        printer = pprint.PrettyPrinter(width=1)
-        printer.format = my_safe_repr
-        output = printer.pformat(captured)
-        captured = highlight(output, PythonLexer(), formatter)
+        css_links = self.resource_urls("css", reqts["css"])
+        js_links = self.resource_urls("js", reqts["js"])
+        phases.mark("resources")
+        phases.defer("template")
 
         # values passed to template for rendering
         return {
@@ -138,18 +291,66 @@ class DeformDemo(object):
             "locale": locale_name,
             "demos": self.get_demos(),
             "title": self.get_title(),
-            "css_links": reqts["css"],
-            "js_links": reqts["js"],
+            "css_links": css_links,
+            "js_links": js_links,
         }
 
-    def get_code(self, level):
-        frame = sys._getframe(level)
-        lines, start = inspect.getsourcelines(frame.f_code)
-        end = start + len(lines)
-        code = "".join(lines)
-        if not PY3:
-            code = unicode(code, "utf-8")
-        return highlight(code, PythonLexer(), formatter), start, end
+    def record_prototype(self, name, form, **kw):
+        """ Keep a prototype of ``form``, the form of the demo ``name``,
+        and ``kw``, the other arguments to ``render_form``, unless the demo
+        has one already.  The arguments of a demo passing a ``success``
+        callback are only kept if the demo is in ``replayable_demos``: the
+        callback may refer to the request it was made for."""
+        form_prototypes = self.request.registry.form_prototypes
+        if name not in form_prototypes:
+            if kw.get("success") is not None and name not in replayable_demos:
+                kw = None
+            form_prototypes[name] = FormPrototype(form), kw
+
+    def build_prototype(self, name):
+        """ Run the view method of the demo ``name`` only to record the
+        prototype of its form, without rendering it."""
+        builder = DeformDemo(self.request)
+        # the method hands its form to render_form
+        builder.render_form = functools.partial(builder.record_prototype, name)
+        method = getattr(DeformDemo, name)
+        while hasattr(method, "__wrapped__"):
+            method = method.__wrapped__
+        method(builder)
+
+    def render_fragment(self, form, appstruct, readonly):
+        # Plain GETs of a demo whose form depends on nothing but its
+        # arguments render the same HTML every time.
+        cache = self.request.registry.fragment_cache
+        name = self.request.view_name
+        if (
+            cache is None
+            or self.request.method not in ("GET", "HEAD")
+            or name not in demo_titles
+            or name in dynamic_demos
+        ):
+            return form.render(appstruct, readonly=readonly)
+        key = (
+            name,
+            get_locale_name(self.request),
+            readonly,
+            fingerprint(appstruct),
+        )
+        html = cache.get(key)
+        if html is None:
+            html = form.render(appstruct, readonly=readonly)
+            cache.set(key, html)
+        return html
+
+    def resource_urls(self, kind, specs):
+        bundler = self.request.registry.bundler
+        if bundler is None:
+            return [self.request.static_url(spec) for spec in specs]
+        return bundler.urls(self.request, kind, specs)
+
+    def get_code(self):
+        name = self.request.view_name
+        return code_cache.get(name, getattr(self.__class__, name))
 
     @view_config(name="thanks.html")
     def thanks(self):
@@ -163,54 +364,114 @@ class DeformDemo(object):
         params = self.request.params
         start = params.get("start")
         end = params.get("end")
-        hl_lines = None
         if start and end:
             start = int(start)
             end = int(end)
-            hl_lines = list(range(start, end))
-        code = open(inspect.getsourcefile(self.__class__), "r").read()
-        code = code.encode("utf-8")
-        formatter = HtmlFormatter(
-            linenos="table",
-            lineanchors="line",
-            cssclass="hightlight ",
-            hl_lines=hl_lines,
-        )
-        html = highlight(code, PythonLexer(), formatter)
+        else:
+            start = end = None
+        mtime, digest = code_listing.refresh()
+        response = self.request.response
+        response.etag = "%s-%s-%s" % (digest, start, end)
+        response.last_modified = mtime
+        if response.etag in self.request.if_none_match or (
+            not self.request.if_none_match
+            and self.request.if_modified_since is not None
+            and self.request.if_modified_since >= response.last_modified
+        ):
+            return HTTPNotModified(etag=response.etag, last_modified=mtime)
+        html = code_listing.render(start, end)
         return {"code": html, "demos": self.get_demos()}
 
+    @view_config(name="validate_field", request_method="POST")
+    def validate_field(self):
+        """ Validate one field of a demo's form, and the fields it contains,
+        without validating or rendering the rest of the form.  The query
+        string names the ``demo`` and the field, by ``oid`` or by ``path``;
+        the body holds the field's controls as the form would submit
+        them."""
+        params = self.request.GET
+        name = params.get("demo")
+        if not (params.get("oid") or params.get("path")):
+            raise HTTPBadRequest("Either oid or path is required")
+        if name not in demo_titles or name in dynamic_demos:
+            raise HTTPNotFound()
+        form_prototypes = self.request.registry.form_prototypes
+        if name not in form_prototypes:
+            self.build_prototype(name)
+        form = form_prototypes[name][0].clone()
+        field = find_field(form, params.get("oid"), params.get("path"))
+        if field is None:
+            raise HTTPNotFound()
+        return validate_subtree(field, self.request.POST.items())
+
+    @view_config(name="profiles", renderer="templates/profiles.pt")
+    def profiles(self):
+        """ List the profiles captured with ``?_profile=<token>`` (see
+        :mod:`deformdemo.profiling`); ``profiles/<filename>`` downloads one,
+        ``profiles/<filename>?format=text`` shows a summary of it.  The
+        ``token`` parameter must be given the profiling token."""
+        store = self.request.registry.profile_store
+        token = self.request.GET.get("token")
+        if store is None or not token_matches(self.request.registry, token):
+            raise HTTPNotFound()
+        if not self.request.subpath:
+            return {
+                "profiles": store.list(),
+                "token": token,
+                "demos": self.get_demos(),
+            }
+        filename = self.request.subpath[0]
+        path = store.path(filename)
+        if path is None:
+            raise HTTPNotFound()
+        if self.request.GET.get("format") == "text":
+            return Response(
+                store.summary(filename), content_type="text/plain"
+            )
+        response = FileResponse(
+            path,
+            request=self.request,
+            content_type="application/octet-stream",
+        )
+        response.content_disposition = "attachment; filename=%s" % filename
+        return response
+
+    @view_config(name="timings", renderer="json")
+    def timings(self):
+        """ The phase durations aggregated per demo since startup, or since
+        the last ``?clear=1``."""
+        stats = self.request.registry.timing_stats
+        if stats is None:
+            raise HTTPNotFound()
+        snapshot = stats.snapshot()
+        if self.request.GET.get("clear"):
+            stats.clear()
+        return snapshot
+
+    @view_config(name="tmpstore_stats", renderer="json")
+    def tmpstore_stats(self):
+        return self.tmpstore.stats()
+
     def get_title(self):
-        # gross hack; avert your eyes
-        frame = sys._getframe(3)
-        attr = frame.f_locals["attr"]
-        inst = frame.f_locals["inst"]
-        method = getattr(inst, attr)
-        return method.demo
+        return demo_titles[self.request.view_name]
 
     @view_config(name="pygments.css")
     def cssview(self):
-        response = Response(body=css, content_type="text/css")
+        response = Response(body=css_asset.body, content_type="text/css")
         response.cache_expires = 360
         return response
 
+    @view_config(name=css_asset.name)
+    def cssasset(self):
+        return css_asset.response(self.request)
+
     @view_config(renderer="templates/index.pt")
     def index(self):
         return {"demos": self.get_demos()}
 
     def get_demos(self):
-        def predicate(value):
-            if getattr(value, "demo", None) is not None:
-                return True
-
-        demos = inspect.getmembers(self, predicate)
-        L = []
-        for name, method in demos:
-            url = self.request.resource_url(
-                self.request.root, name, route_name="deformdemo"
-            )
-            L.append((method.demo, url))
-        L.sort()
-        return L
+        # built once by main(); see collect_demos
+        return self.request.registry.demos
 
     @view_config(renderer="templates/form.pt", name="textinput")
     @demonstrate("Text Input Widget")
@@ -306,7 +567,9 @@ class DeformDemo(object):
     @view_config(
         renderer="templates/form.pt", name="autocomplete_remote_input"
     )
-    @demonstrate("Autocomplete Input Widget (with Remote Data Source)")
+    @demonstrate(
+        "Autocomplete Input Widget (with Remote Data Source)", dynamic=True
+    )
     def autocomplete_remote_input(self):
 
         widget = deform.widget.AutocompleteInputWidget(
@@ -388,7 +651,7 @@ class DeformDemo(object):
         return self.render_form(form)
 
     @view_config(renderer="templates/form.pt", name="richtext_i18n")
-    @demonstrate("Rich Text Widget (internationalized)")
+    @demonstrate("Rich Text Widget (internationalized)", dynamic=True)
     def richtext_i18n(self):
 
         locale_name = get_locale_name(self.request)
@@ -781,7 +1044,7 @@ class DeformDemo(object):
         return self.render_form(form)
 
     @view_config(renderer="templates/form.pt", name="dynamic_field")
-    @demonstrate("Dynamic fields: add and remove")
+    @demonstrate("Dynamic fields: add and remove", dynamic=True)
     def dynamic_field(self):
         class Schema(colander.Schema):
 
@@ -903,7 +1166,7 @@ class DeformDemo(object):
         return self.render_form(form)
 
     @view_config(renderer="templates/form.pt", name="ajaxform")
-    @demonstrate("AJAX form submission (inline success)")
+    @demonstrate("AJAX form submission (inline success)", replay_success=True)
     def ajaxform(self):
         class Mapping(colander.Schema):
             name = colander.SchemaNode(
@@ -931,7 +1194,7 @@ class DeformDemo(object):
         return self.render_form(form, success=succeed)
 
     @view_config(renderer="templates/form.pt", name="ajaxform_redirect")
-    @demonstrate("AJAX form submission (redirect on success)")
+    @demonstrate("AJAX form submission (redirect on success)", dynamic=True)
     def ajaxform_redirect(self):
         class Mapping(colander.Schema):
             name = colander.SchemaNode(
@@ -981,6 +1244,52 @@ class DeformDemo(object):
 
         return self.render_form(form, success=succeed)
 
+    @view_config(renderer="templates/form.pt", name="ajaxform_partial")
+    @demonstrate("AJAX form submission (JSON field updates)")
+    def ajaxform_partial(self):
+        class Mapping(colander.Schema):
+            name = colander.SchemaNode(
+                colander.String(), description="Content name"
+            )
+            date = colander.SchemaNode(
+                colander.Date(),
+                widget=deform.widget.DatePartsWidget(),
+                description="Content date",
+            )
+
+        class Schema(colander.Schema):
+            number = colander.SchemaNode(colander.Integer())
+            mapping = Mapping()
+
+        schema = Schema()
+        # Asking for JSON gets the errors and the fields in error (see
+        # deformdemo.partial.render_partial) rather than the whole form;
+        # only those fields are replaced.
+        options = """
+        {target: null,
+         dataType: 'json',
+         success:
+          function (data, sText, xhr, form) {
+            if (data.valid) {
+              form.replaceWith('<div id="thanks">Thanks!</div>');
+              return;
+            }
+            form.find('.has-error').removeClass('has-error');
+            form.find('[id^="error-"]').remove();
+            $.each(data.fields, function (id, html) {
+              $('#' + id).replaceWith(html);
+            });
+            deform.processCallbacks();
+          }
+        }
+        """
+
+        form = deform.Form(
+            schema, buttons=("submit",), use_ajax=True, ajax_options=options
+        )
+
+        return self.render_form(form)
+
     @view_config(renderer="templates/form.pt", name="sequence_of_radiochoices")
     @demonstrate("Sequence of Radio Choice Widgets")
     def sequence_of_radiochoices(self):
@@ -1055,7 +1364,7 @@ class DeformDemo(object):
         return self.render_form(form)
 
     @view_config(renderer="templates/form.pt", name="sequence_of_i18n")
-    @demonstrate("Sequence of I18N")
+    @demonstrate("Sequence of I18N", dynamic=True)
     def sequence_of_i18n(self):
         import datetime
 
@@ -1124,12 +1433,12 @@ class DeformDemo(object):
         return self.render_form(form)
 
     @view_config(renderer="templates/form.pt", name="sequence_of_fileuploads")
-    @demonstrate("Sequence of File Upload Widgets")
+    @demonstrate("Sequence of File Upload Widgets", replay_success=True)
     def sequence_of_fileuploads(self):
         class Sequence(colander.SequenceSchema):
             upload = colander.SchemaNode(
                 deform.FileData(),
-                widget=deform.widget.FileUploadWidget(tmpstore),
+                widget=deform.widget.FileUploadWidget(self.tmpstore),
             )
 
         class Schema(colander.Schema):
@@ -1138,18 +1447,21 @@ class DeformDemo(object):
         schema = Schema()
         form = deform.Form(schema, buttons=("submit",))
 
-        return self.render_form(form, success=tmpstore.clear)
+        return self.render_form(form, success=self.tmpstore.clear)
 
     @view_config(
         renderer="templates/form.pt",
         name="sequence_of_fileuploads_with_initial_item",
     )
-    @demonstrate("Sequence of File Upload Widgets (with Initial Item)")
+    @demonstrate(
+        "Sequence of File Upload Widgets (with Initial Item)",
+        replay_success=True,
+    )
     def sequence_of_fileuploads_with_initial_item(self):
         class Sequence(colander.SequenceSchema):
             upload = colander.SchemaNode(
                 deform.FileData(),
-                widget=deform.widget.FileUploadWidget(tmpstore),
+                widget=deform.widget.FileUploadWidget(self.tmpstore),
             )
 
         class Schema(colander.Schema):
@@ -1159,7 +1471,7 @@ class DeformDemo(object):
         form = deform.Form(schema, buttons=("submit",))
         form["uploads"].widget = deform.widget.SequenceWidget(min_len=1)
 
-        return self.render_form(form, success=tmpstore.clear)
+        return self.render_form(form, success=self.tmpstore.clear)
 
     @view_config(renderer="templates/form.pt", name="sequence_of_mappings")
     @demonstrate("Sequence of Mapping Widgets")
@@ -1371,26 +1683,28 @@ class DeformDemo(object):
         return self.render_form(form)
 
     @view_config(renderer="templates/form.pt", name="file")
-    @demonstrate("File Upload Widget")
+    @demonstrate("File Upload Widget", replay_success=True)
     def file(self):
         class Schema(colander.Schema):
             upload = colander.SchemaNode(
                 deform.FileData(),
-                widget=deform.widget.FileUploadWidget(tmpstore),
+                widget=deform.widget.FileUploadWidget(self.tmpstore),
             )
 
         schema = Schema()
         form = deform.Form(schema, buttons=("submit",))
 
-        return self.render_form(form, success=tmpstore.clear)
+        return self.render_form(form, success=self.tmpstore.clear)
 
     @view_config(renderer="templates/form.pt", name="file_readonly")
-    @demonstrate("File Upload Widget (read-only)")
+    @demonstrate("File Upload Widget (read-only)", dynamic=True)
     def file_readonly(self):
         class Schema(colander.Schema):
             upload = colander.SchemaNode(
                 deform.FileData(),
-                widget=deform.widget.FileUploadWidget(tmpstore, readonly=True),
+                widget=deform.widget.FileUploadWidget(
+                    self.tmpstore, readonly=True
+                ),
             )
 
         schema = Schema()
@@ -1399,7 +1713,7 @@ class DeformDemo(object):
         appstruct = {"upload": {"uid": "123", "filename": "leavesofgrass.png"}}
 
         return self.render_form(
-            form, appstruct=appstruct, success=tmpstore.clear
+            form, appstruct=appstruct, success=self.tmpstore.clear
         )
 
     @view_config(renderer="templates/form.pt", name="dateparts")
@@ -2121,7 +2435,7 @@ class DeformDemo(object):
         )
 
     @view_config(renderer="templates/form.pt", name="i18n")
-    @demonstrate("Internationalization")
+    @demonstrate("Internationalization", dynamic=True)
     def i18n(self):
 
         minmax = {"min": 1, "max": 10}
@@ -2329,7 +2643,7 @@ class DeformDemo(object):
         return self.render_form(form)
 
     @view_config(renderer="templates/form.pt", name="multiple_forms")
-    @demonstrate("Multiple Forms on the Same Page")
+    @demonstrate("Multiple Forms on the Same Page", dynamic=True)
     def multiple_forms(self):
         import itertools
 
@@ -2385,7 +2699,7 @@ class DeformDemo(object):
 
         html = "".join(html)
 
-        code, start, end = self.get_code(1)
+        code, start, end = self.get_code()
 
         # values passed to template for rendering
         return {
@@ -2395,7 +2709,7 @@ class DeformDemo(object):
             "start": start,
             "demos": self.get_demos(),
             "end": end,
-            "title": "Multiple Forms on the Same Page",
+            "title": self.get_title(),
         }
 
     @view_config(renderer="templates/form.pt", name="widget_adapter")
@@ -2449,7 +2763,7 @@ class DeformDemo(object):
         return self.render_form(form, appstruct=appstruct)
 
     @view_config(renderer="templates/form.pt", name="deferred_schema_bindings")
-    @demonstrate("Deferred Schema Bindings")
+    @demonstrate("Deferred Schema Bindings", dynamic=True)
     def deferred_schema_bindings(self):
         import datetime
         import colander
@@ -2551,7 +2865,7 @@ class DeformDemo(object):
         return self.render_form(form)
 
     @view_config(renderer="templates/form.pt", name="pyramid_csrf_demo")
-    @demonstrate("Pyramid CSRF Demo (using schema binding)")
+    @demonstrate("Pyramid CSRF Demo (using schema binding)", dynamic=True)
     def pyramid_csrf_demo(self):
         @colander.deferred
         def deferred_csrf_default(node, kw):
@@ -2708,7 +3022,9 @@ class DeformDemo(object):
         renderer="templates/form.pt",
         name="custom_classes_on_outermost_html_element",
     )
-    @demonstrate("Custom classes on outermost html element of Widgets")
+    @demonstrate(
+        "Custom classes on outermost html element of Widgets", dynamic=True
+    )
     def custom_classes_on_outermost_html_element(self):
         import datetime
 
@@ -2716,7 +3032,7 @@ class DeformDemo(object):
             upload = colander.SchemaNode(
                 deform.FileData(),
                 widget=deform.widget.FileUploadWidget(
-                    tmpstore, item_css_class="mapped_widget_custom_class"
+                    self.tmpstore, item_css_class="mapped_widget_custom_class"
                 ),
             )
 
@@ -2743,16 +3059,101 @@ class DeformDemo(object):
 
         return self.render_form(deform.Form(Schema(), buttons=("submit",)))
 
+    # Stress demos: forms whose size is set by the query string (``n``
+    # items, sequences nested ``depth`` deep), to see how rendering and
+    # validation scale with the size of a form.
+
+    def stress_param(self, name, default, maximum):
+        value = self.request.GET.get(name, default)
+        try:
+            value = int(value)
+        except ValueError:
+            raise HTTPBadRequest("%s must be an integer" % name)
+        if not 0 <= value <= maximum:
+            raise HTTPBadRequest(
+                "%s must be between 0 and %d" % (name, maximum)
+            )
+        return value
+
+    @view_config(renderer="templates/form.pt", name="stress_mapping")
+    @demonstrate("Stress Test: Mapping with N Fields", dynamic=True)
+    def stress_mapping(self):
+        n = self.stress_param("n", 100, MAX_STRESS_ITEMS)
+
+        schema = colander.Schema()
+        for i in range(n):
+            schema.add(
+                colander.SchemaNode(
+                    colander.String(),
+                    name="field%d" % i,
+                    title="Field %d" % i,
+                )
+            )
+        appstruct = {"field%d" % i: "value %d" % i for i in range(n)}
+        form = deform.Form(schema, buttons=("submit",))
+
+        return self.render_form(form, appstruct=appstruct)
+
+    @view_config(
+        renderer="templates/form.pt", name="stress_sequence_of_mappings"
+    )
+    @demonstrate("Stress Test: Sequence of N Mapping Widgets", dynamic=True)
+    def stress_sequence_of_mappings(self):
+        n = self.stress_param("n", 100, MAX_STRESS_ITEMS)
+
+        class Person(colander.Schema):
+            name = colander.SchemaNode(colander.String())
+            age = colander.SchemaNode(
+                colander.Integer(), validator=colander.Range(0, 200)
+            )
+
+        class People(colander.SequenceSchema):
+            person = Person()
+
+        class Schema(colander.Schema):
+            people = People()
+
+        appstruct = {
+            "people": [
+                {"name": "Person %d" % i, "age": i % 100} for i in range(n)
+            ]
+        }
+        form = deform.Form(Schema(), buttons=("submit",))
 
-class MemoryTmpStore(dict):
-    """ Instances of this class implement the
-    :class:`deform.interfaces.FileUploadTempStore` interface"""
+        return self.render_form(form, appstruct=appstruct)
 
-    def preview_url(self, uid):
-        return None
+    @view_config(
+        renderer="templates/form.pt", name="stress_sequence_of_sequences"
+    )
+    @demonstrate("Stress Test: Sequences Nested D Deep", dynamic=True)
+    def stress_sequence_of_sequences(self):
+        depth = self.stress_param("depth", 3, 8)
+        n = self.stress_param("n", 3, MAX_STRESS_ITEMS)
+        if n ** depth > MAX_STRESS_ITEMS:
+            raise HTTPBadRequest(
+                "n ** depth must not exceed %d" % MAX_STRESS_ITEMS
+            )
+
+        class NameAndTitle(colander.Schema):
+            name = colander.SchemaNode(colander.String())
+            title = colander.SchemaNode(colander.String())
+
+        node = NameAndTitle(name="name_and_title", title="Name and Title")
+        value = {"name": "name", "title": "title"}
+        for level in range(depth, 0, -1):
+            node = colander.SchemaNode(
+                colander.Sequence(),
+                node,
+                name="level%d" % level,
+                title="Level %d" % level,
+            )
+            value = [value] * n
 
+        schema = colander.Schema()
+        schema.add(node)
+        form = deform.Form(schema, buttons=("submit",))
 
-tmpstore = MemoryTmpStore()
+        return self.render_form(form, appstruct={node.name: value})
 
 
 class SequenceToTextWidgetAdapter(object):
@@ -2800,6 +3201,38 @@ class SequenceToTextWidgetAdapter(object):
             field.error = colander.Invalid(field.schema, "\n".join(msgs))
 
 
+def set_page_validators(event):
+    """ Give the index and demo pages a strong ETag, so that revisits are
+    answered with 304 Not Modified, and a Cache-Control policy: pages of
+    dynamic demos must always be revalidated, the others may be cached by
+    anyone for ``deformdemo.page_max_age`` seconds."""
+    request = event.request
+    response = event.response
+    route = request.matched_route
+    name = request.view_name
+    if (
+        request.method not in ("GET", "HEAD")
+        or response.status_int != 200
+        or response.etag is not None
+        or getattr(request, "streamed_form", None) is not None
+        or response.content_type != "text/html"
+        or route is None
+        or route.name != "deformdemo"
+        or (name and name not in demo_titles)
+    ):
+        return
+    response.md5_etag()
+    response.conditional_response = True
+    if name in dynamic_demos:
+        response.cache_control = "private, no-cache"
+    else:
+        settings = request.registry.settings
+        max_age = int(settings.get("deformdemo.page_max_age", 0))
+        response.cache_control = "public, max-age=%d" % max_age
+        # the locale may come from a cookie
+        response.vary = ("Cookie",)
+
+
 def main(global_config, **settings):
     # paster serve entry point
     settings["debug_templates"] = "true"
@@ -2823,12 +3256,98 @@ def main(global_config, **settings):
     # Configure renderer
     configure_zpt_renderer(("deformdemo:custom_widgets",), translator)
 
-    config.add_static_view("static_deform", "deform:static")
-    config.add_static_view("static_demo", "deformdemo:static")
+    # Asset URLs generated by static_url carry a hash of the file's content,
+    # so browsers may cache them for good; URLs without it, which stylesheets
+    # and scripts build themselves, are only cached briefly.
+    static_max_age = int(
+        settings.get("deformdemo.static_max_age", SHORT_MAX_AGE)
+    )
+    precompressed = asbool(settings.get("deformdemo.precompressed_static"))
+    cache_busted = config.registry.cache_busted_patterns = {}
+    for name, spec in (
+        ("static_deform", "deform:static"),
+        ("static_demo", "deformdemo:static"),
+    ):
+        cache_buster = ContentHashCacheBuster(spec)
+        pattern = name + "/*subpath"
+        if precompressed:
+            # shadows the route add_static_view registers below, which is
+            # still used to generate URLs
+            route_name = name + "_precompressed"
+            config.add_route(route_name, pattern)
+            config.add_view(
+                PrecompressedStaticView(spec, cache_max_age=static_max_age),
+                route_name=route_name,
+            )
+        config.add_static_view(name, spec, cache_max_age=static_max_age)
+        config.add_cache_buster(spec, cache_buster)
+        cache_busted[pattern] = cache_buster
+    config.add_subscriber(cache_busted_forever, NewResponse)
+
+    # Bundles are named after their content and never change either.
+    bundler = None
+    if asbool(settings.get("deformdemo.bundle_resources")):
+        bundler = ResourceBundler(settings.get("deformdemo.bundle_dir"))
+        config.add_static_view(
+            "static_bundles", bundler.directory, cache_max_age=FAR_FUTURE
+        )
+    config.registry.bundler = bundler
+
+    # phases of render_form, see deformdemo.timing; subscribers are called
+    # in order, and computing the ETag is not part of the template phase
+    config.registry.timing_stats = None
+    if asbool(settings.get("deformdemo.server_timing")):
+        config.registry.timing_stats = TimingStats()
+        config.add_subscriber(add_server_timing, NewResponse)
+
+    config.add_subscriber(set_page_validators, NewResponse)
+
+    # send the page of a demo before its form is rendered, see StreamedForm
+    config.registry.stream_pages = asbool(
+        settings.get("deformdemo.stream_pages")
+    )
+    config.add_subscriber(stream_form, NewResponse)
+
+    # profiling of single requests, see deformdemo.profiling
+    config.registry.profile_store = None
+    profile_dir = settings.get("deformdemo.profile_dir")
+    if profile_dir and settings.get("deformdemo.profile_token"):
+        config.registry.profile_store = ProfileStore(profile_dir)
+        config.add_tween("deformdemo.profiling.profiler_tween_factory")
+
+    # the store of uploaded files used by the demos, see deformdemo.tmpstore
+    config.registry.tmpstore = make_tmpstore(settings)
+
+    # maps the view name of every demo not marked dynamic to a
+    # (FormPrototype, kw) pair once it has been rendered; kw are the
+    # arguments to render_form, or None if the demo is built on every
+    # request anyway, see DeformDemo.record_prototype
+    config.registry.form_prototypes = {}
+
+    # rendered forms of plain GETs, see DeformDemo.render_fragment
+    size = int(settings.get("deformdemo.fragment_cache_size", 256))
+    config.registry.fragment_cache = LRUCache(size) if size > 0 else None
     config.add_route("deformdemo", "*traverse")
 
     def onerror(*arg):
         pass
 
-    config.scan("deformdemo", onerror=onerror)
+    # the command line scripts and the unit tests are not meant to be
+    # imported by the app
+    config.scan(
+        "deformdemo",
+        onerror=onerror,
+        ignore=["deformdemo.scripts", "deformdemo.tests"],
+    )
+
+    # The sidebar lists every demo on every page; build it once here rather
+    # than once per request.
+    config.registry.demos = collect_demos()
+
+    config.registry.captured_formatter = CapturedFormatter(
+        formatter,
+        highlight_limit=int(
+            settings.get("deformdemo.captured_highlight_limit", 16384)
+        ),
+    )
     return config.make_wsgi_app()
@@ -0,0 +1,377 @@
+""" Helpers for serving static assets efficiently """
+
+# Standard Library
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+from io import BytesIO
+
+# Pyramid
+from pyramid.path import AssetResolver
+from pyramid.response import FileResponse
+from pyramid.response import Response
+from pyramid.static import QueryStringCacheBuster
+from pyramid.static import static_view
+
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+
+#: One year, the longest lifetime caches are expected to honour
+FAR_FUTURE = 365 * 24 * 60 * 60
+
+#: How long static files requested without a cache-busting token may be
+#: cached: their URL does not change with their content
+SHORT_MAX_AGE = 3600
+
+#: Extensions of the static files worth compressing; images and woff fonts
+#: are compressed already
+COMPRESSIBLE = (".css", ".eot", ".html", ".js", ".map", ".svg", ".ttf", ".txt")
+
+#: Content codings of precompressed files, in order of preference, and the
+#: suffix of the files holding them
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()[:12]
+
+
+def gzip_compress(data):
+    buf = BytesIO()
+    # a fixed mtime keeps the output identical across restarts
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=9, mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def brotli_compress(data):
+    return brotli.compress(data, quality=11)
+
+
+def compress_directory(root, min_size=256):
+    """ Write a gzip (``.gz``) and, if the ``brotli`` package is installed,
+    a brotli (``.br``) compressed copy next to every compressible file below
+    ``root``.  Copies which are up to date are left alone; copies which
+    would not be smaller than the original are not written.  Return the
+    paths of the files written."""
+    compressors = [(".gz", gzip_compress)]
+    if brotli is not None:
+        compressors.insert(0, (".br", brotli_compress))
+    written = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.lower().endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(dirpath, filename)
+            mtime = os.stat(path).st_mtime
+            data = None
+            for suffix, compress in compressors:
+                target = path + suffix
+                if os.path.exists(target):
+                    if os.stat(target).st_mtime >= mtime:
+                        continue
+                    os.remove(target)
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                if len(data) < min_size:
+                    break
+                compressed = compress(data)
+                if len(compressed) >= len(data):
+                    continue
+                with open(target, "wb") as f:
+                    f.write(compressed)
+                written.append(target)
+    return written
+
+
+def accepts_encoding(request, coding):
+    """ Return true if the ``Accept-Encoding`` header of ``request`` allows
+    a response in content coding ``coding`` (e.g. ``"gzip"``)."""
+    qualities = {}
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[name.strip().lower()] = q
+    return qualities.get(coding, qualities.get("*", 0.0)) > 0
+
+
+class FingerprintedAsset(object):
+    """ An asset generated in memory and served under a name containing a
+    hash of its content, so that it can be cached forever.
+
+    ``name`` is a format string into which the hash is interpolated, e.g.
+    ``"pygments-%s.css"``.  A gzipped copy of the body is prepared up front
+    and served to clients that accept it."""
+
+    def __init__(self, name, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.digest = hashlib.md5(body).hexdigest()[:12]
+        self.name = name % self.digest
+        self.gzipped = gzip_compress(body)
+
+    def response(self, request):
+        response = Response(content_type=self.content_type)
+        if accepts_encoding(request, "gzip"):
+            response.body = self.gzipped
+            response.content_encoding = "gzip"
+            # the two bodies differ, so must their strong validators
+            response.etag = self.digest + "-gz"
+        else:
+            response.body = self.body
+            response.etag = self.digest
+        response.vary = ("Accept-Encoding",)
+        response.cache_control = "public, max-age=%d, immutable" % FAR_FUTURE
+        return response
+
+
+class ContentHashCacheBuster(QueryStringCacheBuster):
+    """ A cache buster which adds a hash of each file's content to the
+    query string of its URL.
+
+    The hashes of every file below ``spec`` (an asset specification of a
+    directory) are computed once, when the cache buster is created.  Files
+    which appear later are hashed the first time a URL is generated for
+    them."""
+
+    def __init__(self, spec, param="x"):
+        super(ContentHashCacheBuster, self).__init__(param=param)
+        self.root = AssetResolver().resolve(spec).abspath()
+        self.manifest = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                subpath = os.path.relpath(path, self.root)
+                subpath = subpath.replace(os.sep, "/")
+                self.manifest[subpath] = file_digest(path)
+
+    def tokenize(self, request, subpath, kw):
+        token = self.manifest.get(subpath)
+        if token is None:
+            path = os.path.join(self.root, *subpath.split("/"))
+            if not os.path.isfile(path):
+                return "0"
+            token = self.manifest[subpath] = file_digest(path)
+        return token
+
+
+def cache_busted_forever(event):
+    """ Let the static files requested with their current cache-busting
+    token, whose URL changes with their content, be cached for good.
+
+    Static views are registered with a short max-age, which is what files
+    requested without a token, or with a token which is not the one of
+    their content, keep: fonts and images referred to by stylesheets, or
+    the plugins and skins TinyMCE loads.  ``registry.cache_busted_patterns``
+    maps the patterns of the static routes to their
+    :class:`ContentHashCacheBuster`."""
+    request = event.request
+    response = event.response
+    route = request.matched_route
+    if route is None or response.status_int != 200:
+        return
+    cache_buster = request.registry.cache_busted_patterns.get(route.pattern)
+    if cache_buster is None:
+        return
+    token = request.GET.get(cache_buster.param)
+    subpath = "/".join(request.subpath)
+    if not token or token != cache_buster.tokenize(request, subpath, {}):
+        return
+    response.cache_expires = FAR_FUTURE
+    response.headers["Cache-Control"] = (
+        "public, max-age=%d, immutable" % FAR_FUTURE
+    )
+
+
+class PrecompressedStaticView(object):
+    """ A view serving the static files below ``spec`` which sends the
+    precompressed copy of a file made by :func:`compress_directory` to
+    clients accepting its content coding.  Other requests are handled by a
+    regular :class:`pyramid.static.static_view`.
+
+    The precompressed copies are looked up once, when the view is created;
+    copies older than their original are ignored."""
+
+    def __init__(self, spec, cache_max_age=SHORT_MAX_AGE):
+        self.cache_max_age = cache_max_age
+        self.fallback = static_view(
+            spec, cache_max_age=cache_max_age, use_subpath=True
+        )
+        root = AssetResolver().resolve(spec).abspath()
+        self.variants = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                mtime = os.stat(path).st_mtime
+                variants = []
+                for coding, suffix in PRECOMPRESSED:
+                    target = path + suffix
+                    if filename + suffix not in filenames:
+                        continue
+                    if os.stat(target).st_mtime < mtime:
+                        continue
+                    variants.append((coding, target))
+                if variants:
+                    content_type, _ = mimetypes.guess_type(path)
+                    subpath = os.path.relpath(path, root)
+                    subpath = tuple(subpath.split(os.sep))
+                    self.variants[subpath] = content_type, variants
+
+    def __call__(self, context, request):
+        entry = self.variants.get(tuple(request.subpath))
+        if entry is None:
+            return self.fallback(context, request)
+        content_type, variants = entry
+        for coding, path in variants:
+            if accepts_encoding(request, coding):
+                response = FileResponse(
+                    path,
+                    request=request,
+                    cache_max_age=self.cache_max_age,
+                    content_type=content_type or "application/octet-stream",
+                    content_encoding=coding,
+                )
+                break
+        else:
+            response = self.fallback(context, request)
+        response.vary = ("Accept-Encoding",)
+        return response
+
+
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+CSS_SPACE = re.compile(r"\s*([{};,>])\s*")
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    text = CSS_COMMENT.sub("", text)
+    text = CSS_SPACE.sub(r"\1", text)
+    return " ".join(text.split())
+
+
+def minify_js(text):
+    # without rjsmin, scripts are only concatenated: minifying them safely
+    # takes a tokenizer
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return text
+
+
+class ResourceBundler(object):
+    """ Bundles the CSS and JavaScript resources a form requires (see
+    :meth:`deform.Field.get_widget_resources`) into one CSS and one
+    JavaScript file per distinct set of resources.
+
+    Bundles are minified, named after a hash of their content and written
+    to ``directory``, which must be served by a static view.  Resources
+    whose asset specification contains one of the strings in ``exclude``
+    are linked on their own; TinyMCE, for instance, finds its plugins
+    relative to its own URL."""
+
+    def __init__(self, directory=None, exclude=("tinymce",)):
+        if directory is None:
+            directory = os.path.join(
+                tempfile.gettempdir(), "deformdemo-bundles"
+            )
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = os.path.abspath(directory)
+        self.exclude = tuple(exclude)
+        self.bundles = {}
+
+    def urls(self, request, kind, specs):
+        """ Return the URLs to link in place of ``specs``, a sequence of
+        asset specifications of ``kind`` ``"css"`` or ``"js"``.  The order
+        of the resources is kept."""
+        urls = []
+        run = []
+        for spec in specs:
+            if any(name in spec for name in self.exclude):
+                urls.extend(self.run_urls(request, kind, run))
+                urls.append(request.static_url(spec))
+                run = []
+            else:
+                run.append(spec)
+        urls.extend(self.run_urls(request, kind, run))
+        return urls
+
+    def run_urls(self, request, kind, specs):
+        if len(specs) < 2:
+            return [request.static_url(spec) for spec in specs]
+        # rebased stylesheets refer to the application's mount point
+        key = request.script_name, kind, tuple(specs)
+        path = self.bundles.get(key)
+        if path is None:
+            path = self.bundles[key] = self.write(request, kind, specs)
+        return [request.static_url(path)]
+
+    def write(self, request, kind, specs):
+        parts = []
+        for spec in specs:
+            with open(AssetResolver().resolve(spec).abspath(), "rb") as f:
+                text = f.read().decode("utf-8")
+            if kind == "css":
+                parts.append(minify_css(self.rebase(request, spec, text)))
+            else:
+                parts.append(minify_js(text))
+        # a lone semicolon ends any statement left open by the previous file
+        data = ("\n" if kind == "css" else "\n;\n").join(parts)
+        data = data.encode("utf-8")
+        name = "%s.%s" % (hashlib.md5(data).hexdigest()[:12], kind)
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            # write under a temporary name so that no one sees a partial file
+            fd, tmp = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp, 0o644)
+            os.rename(tmp, path)
+        return path
+
+    def rebase(self, request, spec, text):
+        """ Rewrite the relative ``url()`` references of the stylesheet
+        ``spec`` as paths which still work from the bundle's URL."""
+        package, _, subpath = spec.rpartition(":")
+        base = posixpath.dirname(subpath)
+
+        def replace(match):
+            url = match.group(2).strip()
+            if url.startswith(("/", "#", "data:")) or ":" in url.split("/")[0]:
+                return match.group(0)
+            path, _, fragment = url.partition("#")
+            path = posixpath.normpath(posixpath.join(base, path.split("?")[0]))
+            url = request.static_path("%s:%s" % (package, path))
+            if fragment:
+                url += "#" + fragment
+            return 'url("%s")' % url
+
+        return CSS_URL.sub(replace, text)
@@ -0,0 +1,90 @@
+""" Caches which keep the demos from redoing work on every request """
+
+# Standard Library
+import hashlib
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+
+
+def iter_fields(field):
+    yield field
+    for child in field.children:
+        for descendant in iter_fields(child):
+            yield descendant
+
+
+class FormPrototype(object):
+    """ A pristine copy of a :class:`deform.Form` from which fresh forms
+    are stamped out by :meth:`clone`.
+
+    Cloning copies the attributes of each field of the tree and shares
+    everything else -- schema nodes, widgets, the renderer -- with the
+    prototype, which is much cheaper than building the schema and the form
+    again.  Clones keep the ``oid`` of the fields they copy and get a
+    counter of their own, so their markup is identical to that of a newly
+    built form.  The form passed in should not have been validated or
+    rendered yet."""
+
+    def __init__(self, form):
+        fields = list(iter_fields(form))
+        for field in fields:
+            # resolve lazily computed default widgets once, for all clones
+            field.widget
+        self.start = max(field.order for field in fields) + 1
+        self.form = self.copy(form, None, itertools.count(self.start))
+
+    def clone(self):
+        return self.copy(self.form, None, itertools.count(self.start))
+
+    def copy(self, field, parent, counter):
+        cloned = field.__class__.__new__(field.__class__)
+        cloned.__dict__.update(field.__dict__)
+        cloned.counter = counter
+        cloned._parent = None if parent is None else weakref.ref(parent)
+        cloned.children = [
+            self.copy(child, cloned, counter) for child in field.children
+        ]
+        return cloned
+
+
+class LRUCache(object):
+    """ A thread safe mapping holding at most ``maxsize`` entries, which
+    forgets the least recently used entry first."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.entries[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def fingerprint(value):
+    """ Return a digest identifying ``value`` by its ``repr``. """
+    return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()
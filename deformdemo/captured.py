@@ -0,0 +1,135 @@
+""" Display of the appstruct captured from a successful form submission """
+
+# Standard Library
+from operator import itemgetter
+
+
+try:
+    from html import escape
+except ImportError:
+    from cgi import escape
+
+import six
+from pygments import highlight
+from pygments.lexers import PythonLexer
+
+
+def safe_key(obj):
+    # orders values of mixed, unorderable types by type first, like pprint
+    return str(type(obj)), repr(obj)
+
+
+def safe_sorted(items):
+    try:
+        return sorted(items)
+    except TypeError:
+        return sorted(items, key=safe_key)
+
+
+def sorted_items(mapping):
+    try:
+        return sorted(mapping.items(), key=itemgetter(0))
+    except TypeError:
+        return sorted(mapping.items(), key=lambda item: safe_key(item[0]))
+
+
+class CapturedFormatter(object):
+    """ Format a captured appstruct as highlighted HTML.
+
+    The layout is the one ``pprint`` uses with ``width=1``: every item of a
+    container with more than one item on its own line, dictionaries and
+    sets sorted.  The text is produced as a stream of chunks so that huge
+    submissions can be cut short:
+
+    - containers nested deeper than ``max_depth`` are elided as ``[...]``,
+
+    - only the first ``max_items`` items of a container are shown,
+
+    - output stops after ``max_size`` characters.
+
+    Output longer than ``highlight_limit`` characters is escaped rather
+    than run through Pygments."""
+
+    def __init__(
+        self,
+        formatter,
+        max_depth=8,
+        max_items=200,
+        max_size=65536,
+        highlight_limit=16384,
+    ):
+        self.formatter = formatter
+        self.lexer = PythonLexer()
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_size = max_size
+        self.highlight_limit = highlight_limit
+
+    def __call__(self, obj):
+        output = self.pformat(obj)
+        if len(output) > self.highlight_limit:
+            return escape(output)
+        return highlight(output, self.lexer, self.formatter)
+
+    def pformat(self, obj):
+        chunks = []
+        size = 0
+        for chunk in self.iterformat(obj):
+            size += len(chunk)
+            if size > self.max_size:
+                chunks.append(chunk[: len(chunk) - size + self.max_size])
+                chunks.append("\n... (truncated)")
+                break
+            chunks.append(chunk)
+        return "".join(chunks)
+
+    def iterformat(self, obj, indent=0, depth=0):
+        if isinstance(obj, dict):
+            items = sorted_items(obj)
+            return self.itercontainer(items, "{", "}", indent, depth, True)
+        if isinstance(obj, list):
+            return self.itercontainer(obj, "[", "]", indent, depth)
+        if isinstance(obj, tuple) and not hasattr(obj, "_fields"):
+            close = ",)" if len(obj) == 1 else ")"
+            return self.itercontainer(obj, "(", close, indent, depth)
+        if isinstance(obj, (set, frozenset)) and obj:
+            items = safe_sorted(obj)
+            if isinstance(obj, frozenset):
+                return self.itercontainer(
+                    items, "frozenset({", "})", indent, depth
+                )
+            return self.itercontainer(items, "{", "}", indent, depth)
+        return iter((self.scalar(obj),))
+
+    def itercontainer(self, items, start, end, indent, depth, pairs=False):
+        if not items:
+            yield start + end
+            return
+        if depth >= self.max_depth:
+            yield start + "..." + end
+            return
+        indent += len(start)
+        separator = ",\n" + " " * indent
+        yield start
+        for i, item in enumerate(items):
+            if i:
+                yield separator
+            if i == self.max_items:
+                yield "..."
+                break
+            if pairs:
+                key, value = item
+                key = self.scalar(key) + ": "
+                yield key
+                chunks = self.iterformat(value, indent + len(key), depth + 1)
+            else:
+                chunks = self.iterformat(item, indent, depth + 1)
+            for chunk in chunks:
+                yield chunk
+        yield end
+
+    def scalar(self, obj):
+        if six.PY2 and isinstance(obj, six.text_type):
+            # eliminate u''
+            obj = obj.encode("utf-8")
+        return repr(obj)
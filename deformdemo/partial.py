@@ -0,0 +1,127 @@
+""" A JSON protocol for patching a form in place after an AJAX submission """
+
+# Pyramid
+import colander
+from pyramid.response import Response
+
+# Deform
+import deform
+
+import peppercorn
+
+
+def wants_partial(request):
+    """ Return true if ``request`` is an AJAX request asking for a JSON
+    response rather than the HTML of the whole form."""
+    if not request.is_xhr:
+        return False
+    return "application/json" in request.headers.get("Accept", "")
+
+
+def iter_parents(field, parent=None, sequence_items=True):
+    """ Yield ``(field, parent)`` for ``field`` and each of its
+    descendants.  The items of a sequence are not among its ``children``
+    but in its ``sequence_fields``, filled when the sequence is validated
+    or rendered; they are walked too unless ``sequence_items`` is false."""
+    yield field, parent
+    children = list(field.children)
+    if sequence_items:
+        children.extend(getattr(field, "sequence_fields", ()))
+    for child in children:
+        for item in iter_parents(child, field, sequence_items):
+            yield item
+
+
+def field_errors(field):
+    """ Return the translated error messages of ``field`` and of its
+    descendants, keyed by ``oid``."""
+    errors = {}
+    for field, _ in iter_parents(field):
+        if field.error is None:
+            continue
+        messages = [field.translate(msg) for msg in field.error.messages()]
+        messages = [msg for msg in messages if msg]
+        if messages:
+            errors[field.oid] = messages
+    return errors
+
+
+def find_field(form, oid=None, path=None):
+    """ Return the field of ``form`` whose ``oid`` is ``oid`` or, failing
+    that, the field at ``path``, the dotted names of the fields leading to
+    it from the form (e.g. ``"people.person.name"``).  Return ``None`` if
+    there is no such field."""
+    if oid:
+        for field, _ in iter_parents(form):
+            if field.oid == oid:
+                return field
+        return None
+    field = form
+    for name in (path or "").split("."):
+        if not name:
+            return None
+        try:
+            field = field[name]
+        except KeyError:
+            return None
+    return field
+
+
+def validate_subtree(field, controls):
+    """ Validate the part of the form ``controls`` (a sequence of submitted
+    name/value pairs) which belongs to ``field`` against the field's schema
+    node alone, and return a JSON response with ``oid``, ``valid`` and the
+    ``errors`` of the subtree as in :func:`render_partial`.
+
+    Validators of the field's ancestors, such as interfield validators
+    attached to the form, are not run."""
+    pstruct = peppercorn.parse(controls).get(field.name, colander.null)
+    try:
+        field.validate_pstruct(pstruct)
+        valid = True
+    except deform.ValidationFailure:
+        valid = False
+    data = {"oid": field.oid, "valid": valid, "errors": field_errors(field)}
+    return Response(json_body=data, content_type="application/json")
+
+
+def render_partial(form, valid):
+    """ Return a JSON response describing ``form`` after a submission:
+
+    - ``valid``: whether the submission validated,
+
+    - ``errors``: the translated error messages of each field in error,
+      keyed by the field's ``oid``,
+
+    - ``fields``: the HTML of the innermost fields in error, rendered with
+      the item template of their parent, keyed by the ``id`` of the
+      fragment's root element, ``item-<oid>``.  Each fragment replaces the
+      element with the same ``id``; error markup not listed in ``errors``
+      is stale and may be removed by the client.
+
+    The form itself is never rendered whole: an error raised against the
+    form only appears in ``errors``.  The items a browser adds to a
+    sequence get ``oid`` values of its own making, which the server's do not
+    match, so errors within a sequence are listed under the server's
+    ``oid`` but shown by the fragment of the whole sequence."""
+    errors = field_errors(form)
+    fields = {}
+    for field, parent in iter_parents(form, sequence_items=False):
+        if field.error is None:
+            continue
+        if parent is None or any(
+            child.error is not None for child in field.children
+        ):
+            continue
+        template = getattr(parent.widget, "item_template", None)
+        if template is not None:
+            fields["item-" + field.oid] = field.render_template(
+                template, field=field, cstruct=field.cstruct, parent=parent
+            )
+    data = {
+        "formid": form.formid,
+        "valid": valid,
+        "errors": errors,
+        "fields": fields,
+    }
+    return Response(json_body=data, content_type="application/json")
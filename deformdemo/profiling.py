@@ -0,0 +1,96 @@
+""" Opt-in profiling of single requests, for diagnosing slow demos """
+
+# Standard Library
+import cProfile
+import datetime
+import hmac
+import os
+import pstats
+import re
+
+from six import StringIO
+
+
+#: The query string parameter which asks for a request to be profiled; its
+#: value must be the ``deformdemo.profile_token`` setting
+PARAM = "_profile"
+
+
+def token_matches(registry, value):
+    token = registry.settings.get("deformdemo.profile_token")
+    if not token or not value:
+        return False
+    return hmac.compare_digest(str(token), str(value))
+
+
+class ProfileStore(object):
+    """ The directory to which profiles are dumped, as ``pstats`` files
+    named after the demo and the time of the request."""
+
+    suffix = ".prof"
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = os.path.abspath(directory)
+
+    def save(self, profile, name):
+        """ Dump ``profile`` (a :class:`cProfile.Profile`) of a request to
+        the view ``name`` and return the name of the file."""
+        name = re.sub(r"[^\w.-]", "_", name) or "index"
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S.%f")
+        filename = "%s-%s%s" % (name, stamp, self.suffix)
+        profile.dump_stats(os.path.join(self.directory, filename))
+        return filename
+
+    def list(self):
+        """ Return ``(filename, size, mtime)`` for every profile, newest
+        first."""
+        profiles = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(self.suffix):
+                stat = os.stat(os.path.join(self.directory, filename))
+                mtime = datetime.datetime.utcfromtimestamp(stat.st_mtime)
+                profiles.append((filename, stat.st_size, mtime))
+        profiles.sort(key=lambda profile: profile[2], reverse=True)
+        return profiles
+
+    def path(self, filename):
+        """ Return the path of the profile ``filename``, or ``None`` if
+        there is no such profile."""
+        if os.path.basename(filename) != filename:
+            return None
+        if not filename.endswith(self.suffix):
+            return None
+        path = os.path.join(self.directory, filename)
+        if not os.path.isfile(path):
+            return None
+        return path
+
+    def summary(self, filename, limit=40):
+        """ Return the ``limit`` functions of the profile ``filename`` with
+        the highest cumulative time, as text."""
+        out = StringIO()
+        stats = pstats.Stats(self.path(filename), stream=out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+def profiler_tween_factory(handler, registry):
+    """ Profile the requests whose ``_profile`` parameter matches the
+    ``deformdemo.profile_token`` setting and dump their profile to
+    ``registry.profile_store``.  The name of the file is sent in the
+    ``X-Profile`` header.  The rendering of streamed forms happens after
+    the request is handled and is not profiled."""
+    store = registry.profile_store
+
+    def profiler_tween(request):
+        if not token_matches(registry, request.GET.get(PARAM)):
+            return handler(request)
+        profile = cProfile.Profile()
+        response = profile.runcall(handler, request)
+        filename = store.save(profile, getattr(request, "view_name", ""))
+        response.headers["X-Profile"] = filename
+        return response
+
+    return profiler_tween
@@ -0,0 +1,319 @@
+""" Time the rendering and the submission of every demo in-process and
+write the results as JSON """
+
+from __future__ import division
+from __future__ import print_function
+
+# Standard Library
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+
+# Pyramid
+from pyramid.paster import get_app
+
+import pkg_resources
+from six.moves.html_parser import HTMLParser
+from webob import Request
+
+# Deform Demo
+import deformdemo
+
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+class FormControls(HTMLParser):
+    """ Collects the controls the first form of a page would submit as it
+    is rendered, in document order, pressing its first button."""
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.controls = []
+        self.state = "before"
+        self.button = None
+        self.textarea = None
+        self.select = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.state == "before" and tag == "form":
+            self.state = "in"
+            return
+        if self.state != "in":
+            return
+        attrs = dict(attrs)
+        name = attrs.get("name")
+        if tag == "input" and name:
+            kind = attrs.get("type", "text").lower()
+            if kind in ("checkbox", "radio"):
+                if "checked" in attrs:
+                    self.controls.append((name, attrs.get("value", "on")))
+            elif kind in ("submit", "image"):
+                if self.button is None:
+                    self.button = name, attrs.get("value", "")
+            elif kind not in ("file", "reset", "button"):
+                self.controls.append((name, attrs.get("value", "")))
+        elif tag == "button" and name:
+            if self.button is None and attrs.get("type") != "button":
+                self.button = name, attrs.get("value", "")
+        elif tag == "textarea" and name:
+            self.textarea = [name]
+        elif tag == "select" and name:
+            self.select = name, [], "multiple" in attrs
+        elif tag == "option" and self.select is not None:
+            self.select[1].append((attrs.get("value"), "selected" in attrs))
+
+    def handle_data(self, data):
+        if self.textarea is not None:
+            self.textarea.append(data)
+        elif self.select is not None and self.select[1]:
+            value, selected = self.select[1][-1]
+            if value is None:
+                self.select[1][-1] = data.strip(), selected
+
+    def handle_endtag(self, tag):
+        if self.state != "in":
+            return
+        if tag == "form":
+            self.state = "after"
+        elif tag == "textarea" and self.textarea is not None:
+            name = self.textarea[0]
+            self.controls.append((name, "".join(self.textarea[1:])))
+            self.textarea = None
+        elif tag == "select" and self.select is not None:
+            name, options, multiple = self.select
+            values = [value for value, selected in options if selected]
+            if not values and options and not multiple:
+                values = [options[0][0]]
+            self.controls.extend((name, value) for value in values)
+            self.select = None
+
+    def result(self):
+        if self.button is None:
+            return self.controls
+        return self.controls + [self.button]
+
+
+def form_controls(html):
+    parser = FormControls()
+    parser.feed(html)
+    parser.close()
+    return parser.result()
+
+
+def percentile(samples, percent):
+    # nearest rank
+    ordered = sorted(samples)
+    rank = int(math.ceil(percent / 100 * len(ordered)))
+    return ordered[max(rank, 1) - 1]
+
+
+def summarize(samples):
+    return {
+        "median_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "samples": len(samples),
+    }
+
+
+def call(app, make_request):
+    request = make_request()
+    start = timer()
+    response = request.get_response(app)
+    body = response.body
+    return timer() - start, response, body
+
+
+def peak_bytes(app, make_request):
+    """ Return the peak of the memory allocated while serving a request, or
+    ``None`` when allocations cannot be traced."""
+    if tracemalloc is None:
+        return None
+    request = make_request()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        request.get_response(app).body
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(app, make_request, iterations, cold=True):
+    """ Serve the request made by ``make_request`` once, timed as
+    ``cold_ms`` if ``cold`` is true, then ``iterations`` times warm.
+    Return the results and the first response."""
+    gc.collect()
+    first, response, body = call(app, make_request)
+    result = {"status": response.status_int}
+    if cold:
+        result["cold_ms"] = round(first * 1000, 3)
+    if response.status_int != 200:
+        return result, response
+    samples = [call(app, make_request)[0] for _ in range(iterations)]
+    result["warm"] = summarize(samples)
+    result["peak_bytes"] = peak_bytes(app, make_request)
+    return result, response
+
+
+def load_posts(path=None):
+    """ Return the controls to submit to the demos, from the JSON file
+    ``path`` or, by default, those shipped for the demos whose forms do not
+    validate with the values they render with.
+
+    The file maps demo names to lists of ``[name, value]`` controls.  A
+    value of ``null`` is replaced by the value the form renders with, such
+    as a CSRF token; a ``[filename, content]`` value is uploaded as a
+    file."""
+    if path is None:
+        data = pkg_resources.resource_string(__name__, "posts.json")
+    else:
+        with open(path, "rb") as f:
+            data = f.read()
+    posts = json.loads(data.decode("utf-8"))
+    return dict(
+        (name, [tuple(control) for control in controls])
+        for name, controls in posts.items()
+    )
+
+
+def benchmark_demo(app, url, iterations, controls=None):
+    """ Time a GET of ``url`` and a POST of ``controls``, by default the
+    controls its form renders with.  The POST is not timed cold: the GET
+    has built the form and warmed the caches already."""
+    result = {}
+
+    def get():
+        return Request.blank(url)
+
+    result["get"], response = measure(app, get, iterations)
+    if result["get"]["status"] != 200:
+        return result
+    rendered = form_controls(response.text)
+    if controls is None:
+        controls = rendered
+    else:
+        values = dict(rendered)
+        controls = [
+            (name, values.get(name, "") if value is None else value)
+            for name, value in controls
+        ]
+    if not controls:
+        return result
+    # the session holds the CSRF token some forms render
+    cookies = response.headers.getall("Set-Cookie")
+    cookies = "; ".join(cookie.split(";")[0] for cookie in cookies)
+    content_type = None
+    if any(isinstance(value, (list, tuple)) for _, value in controls):
+        content_type = "multipart/form-data"
+
+    def post():
+        return Request.blank(
+            url,
+            POST=controls,
+            headers={"Cookie": cookies},
+            content_type=content_type,
+        )
+
+    result["post"], response = measure(app, post, iterations, cold=False)
+    # a submission which did not validate renders the messages of the fields
+    # in error; the source code shown below the form has its quotes escaped
+    result["post"]["valid"] = b'id="error-' not in response.body
+    return result
+
+
+def versions():
+    found = {"python": platform.python_version()}
+    for name in ("deform", "colander", "pyramid", "chameleon"):
+        try:
+            found[name] = pkg_resources.get_distribution(name).version
+        except pkg_resources.DistributionNotFound:
+            found[name] = None
+    return found
+
+
+def main(argv=sys.argv):
+    parser = argparse.ArgumentParser(
+        prog="deformdemo_benchmark", description=__doc__
+    )
+    parser.add_argument(
+        "config",
+        nargs="?",
+        help="PasteDeploy configuration file of the application "
+        "(default: deformdemo with the settings given by -s)",
+    )
+    parser.add_argument(
+        "-s",
+        "--setting",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="application setting, when no configuration file is given",
+    )
+    parser.add_argument(
+        "-n",
+        "--iterations",
+        type=int,
+        default=50,
+        help="warm requests per demo and method (default: 50)",
+    )
+    parser.add_argument(
+        "-d",
+        "--demo",
+        action="append",
+        default=[],
+        metavar="NAME",
+        help="benchmark this demo only; may be repeated",
+    )
+    parser.add_argument(
+        "-p",
+        "--posts",
+        metavar="FILE",
+        help="JSON file mapping demo names to the list of [name, value] "
+        "controls to submit, instead of the values the form renders with "
+        "(default: the file shipped for the forms those do not validate)",
+    )
+    parser.add_argument(
+        "-o", "--output", metavar="FILE", help="write to FILE, not stdout"
+    )
+    args = parser.parse_args(argv[1:])
+
+    if args.config:
+        app = get_app(args.config)
+    else:
+        settings = dict(s.split("=", 1) for s in args.setting)
+        app = deformdemo.main({}, **settings)
+    posts = load_posts(args.posts)
+
+    results = {}
+    for title, name, url in app.registry.demos:
+        if args.demo and name not in args.demo:
+            continue
+        print(title, file=sys.stderr)
+        try:
+            results[name] = benchmark_demo(
+                app, "/" + url, args.iterations, posts.get(name)
+            )
+        except Exception as e:
+            results[name] = {"error": repr(e)}
+
+    report = {
+        "iterations": args.iterations,
+        "versions": versions(),
+        "demos": results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
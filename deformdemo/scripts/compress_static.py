@@ -0,0 +1,36 @@
+""" Write precompressed copies of static assets for
+``deformdemo.precompressed_static`` to serve """
+
+from __future__ import print_function
+
+# Standard Library
+import argparse
+import sys
+
+# Pyramid
+from pyramid.path import AssetResolver
+
+# Deform Demo
+from deformdemo.assets import brotli
+from deformdemo.assets import compress_directory
+
+
+def main(argv=sys.argv):
+    parser = argparse.ArgumentParser(
+        prog="deformdemo_compress_static", description=__doc__
+    )
+    parser.add_argument(
+        "specs",
+        nargs="*",
+        default=["deformdemo:static"],
+        metavar="spec",
+        help="asset specification of a static directory "
+        "(default: deformdemo:static)",
+    )
+    args = parser.parse_args(argv[1:])
+    if brotli is None:
+        print("brotli is not installed; writing gzip copies only")
+    for spec in args.specs:
+        root = AssetResolver().resolve(spec).abspath()
+        written = compress_directory(root)
+        print("%s: wrote %d files" % (spec, len(written)))
@@ -0,0 +1,276 @@
+""" Drive the application with concurrent requests over a weighted mix of
+demo URLs and report throughput and latency percentiles per URL """
+
+from __future__ import division
+from __future__ import print_function
+
+# Standard Library
+import argparse
+import bisect
+import json
+import multiprocessing
+import random
+import sys
+import threading
+
+# Pyramid
+from pyramid.paster import get_app
+
+from webob import Request
+
+# Deform Demo
+import deformdemo
+from deformdemo.scripts.benchmark import percentile
+from deformdemo.scripts.benchmark import timer
+
+
+#: Upper bounds, in milliseconds, of the buckets of the latency histograms
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def load_app(config, settings):
+    if config:
+        return get_app(config)
+    return deformdemo.main({}, **settings)
+
+
+class Mix(object):
+    """ A weighted choice among URLs; ``weights`` maps URLs to their
+    relative weights."""
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.urls = sorted(weights)
+        self.totals = []
+        total = 0
+        for url in self.urls:
+            total += weights[url]
+            self.totals.append(total)
+        self.total = total
+
+    def choose(self, rng):
+        return self.urls[bisect.bisect(self.totals, rng.random() * self.total)]
+
+
+def drive(app, mix, duration, seed, warmup):
+    """ Send requests chosen from ``mix`` to ``app`` for ``duration``
+    seconds and return ``(url, status, seconds)`` for each."""
+    for url in mix.urls:
+        for _ in range(warmup):
+            Request.blank(url).get_response(app).body
+    rng = random.Random(seed)
+    samples = []
+    deadline = timer() + duration
+    while True:
+        url = mix.choose(rng)
+        start = timer()
+        if start >= deadline:
+            return samples
+        response = Request.blank(url).get_response(app)
+        response.body
+        samples.append((url, response.status_int, timer() - start))
+
+
+def process_worker(job):
+    config, settings, weights, duration, seed, warmup = job
+    app = load_app(config, settings)
+    return drive(app, Mix(weights), duration, seed, warmup)
+
+
+def run_threads(app, mix, workers, duration, seed, warmup):
+    results = [None] * workers
+
+    def target(i):
+        results[i] = drive(app, mix, duration, seed + i, warmup)
+
+    threads = [
+        threading.Thread(target=target, args=(i,)) for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_processes(config, settings, mix, workers, duration, seed, warmup):
+    jobs = [
+        (config, settings, mix.weights, duration, seed + i, warmup)
+        for i in range(workers)
+    ]
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(process_worker, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def histogram(latencies):
+    counts = [0] * (len(BUCKETS) + 1)
+    for seconds in latencies:
+        counts[bisect.bisect_left(BUCKETS, seconds * 1000)] += 1
+    # a list, so that the buckets stay in order in the JSON output
+    labels = ["<=%dms" % bound for bound in BUCKETS]
+    labels.append(">%dms" % BUCKETS[-1])
+    return [list(bucket) for bucket in zip(labels, counts)]
+
+
+def summarize(samples, duration):
+    by_url = {}
+    for url, status, seconds in samples:
+        by_url.setdefault(url, []).append((status, seconds))
+    urls = {}
+    for url, results in sorted(by_url.items()):
+        latencies = [seconds for _, seconds in results]
+        urls[url] = {
+            "requests": len(results),
+            "errors": sum(1 for status, _ in results if status >= 400),
+            "rps": round(len(results) / duration, 2),
+            "median_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(max(latencies) * 1000, 3),
+            "histogram": histogram(latencies),
+        }
+    latencies = [seconds for _, _, seconds in samples]
+    total = {
+        "requests": len(samples),
+        "rps": round(len(samples) / duration, 2),
+    }
+    if latencies:
+        total["median_ms"] = round(percentile(latencies, 50) * 1000, 3)
+        total["p99_ms"] = round(percentile(latencies, 99) * 1000, 3)
+    return {"total": total, "urls": urls}
+
+
+def parse_url(value):
+    url, _, weight = value.rpartition("@")
+    if not url:
+        return value, 1.0
+    return url, float(weight)
+
+
+def main(argv=sys.argv):
+    parser = argparse.ArgumentParser(
+        prog="deformdemo_load", description=__doc__
+    )
+    parser.add_argument(
+        "config",
+        nargs="?",
+        help="PasteDeploy configuration file of the application "
+        "(default: deformdemo with the settings given by -s)",
+    )
+    parser.add_argument(
+        "-s",
+        "--setting",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="application setting, when no configuration file is given",
+    )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        choices=("thread", "process"),
+        default="thread",
+        help="run the workers as threads sharing one application, or as "
+        "processes with an application each (default: thread)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=4,
+        help="number of concurrent workers (default: 4)",
+    )
+    parser.add_argument(
+        "-t",
+        "--duration",
+        type=float,
+        default=10.0,
+        help="seconds to send requests for (default: 10)",
+    )
+    parser.add_argument(
+        "-u",
+        "--url",
+        action="append",
+        default=[],
+        metavar="URL[@WEIGHT]",
+        help="request URL with relative WEIGHT (default 1); may be repeated "
+        "(default: every demo, with equal weights)",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=1,
+        help="requests per URL and worker before timing starts (default: 1)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "-o", "--output", metavar="FILE", help="also write JSON to FILE"
+    )
+    args = parser.parse_args(argv[1:])
+
+    settings = dict(s.split("=", 1) for s in args.setting)
+    app = load_app(args.config, settings)
+    if args.url:
+        weights = dict(parse_url(url) for url in args.url)
+    else:
+        weights = dict(("/" + demo[2], 1.0) for demo in app.registry.demos)
+    mix = Mix(weights)
+
+    print(
+        "%d %s workers, %d URLs, %gs"
+        % (args.workers, args.mode, len(mix.urls), args.duration),
+        file=sys.stderr,
+    )
+    if args.mode == "thread":
+        results = run_threads(
+            app, mix, args.workers, args.duration, args.seed, args.warmup
+        )
+    else:
+        results = run_processes(
+            args.config,
+            settings,
+            mix,
+            args.workers,
+            args.duration,
+            args.seed,
+            args.warmup,
+        )
+    samples = [sample for result in results for sample in result]
+    report = summarize(samples, args.duration)
+    report["mode"] = args.mode
+    report["workers"] = args.workers
+    report["duration"] = args.duration
+
+    row = "%-50s %8s %8s %10s %10s %10s"
+    print(row % ("url", "requests", "rps", "median_ms", "p99_ms", "errors"))
+    for url, stats in sorted(report["urls"].items()):
+        print(
+            row
+            % (
+                url,
+                stats["requests"],
+                stats["rps"],
+                stats["median_ms"],
+                stats["p99_ms"],
+                stats["errors"],
+            )
+        )
+    total = report["total"]
+    print(
+        row
+        % (
+            "total",
+            total["requests"],
+            total["rps"],
+            total.get("median_ms", ""),
+            total.get("p99_ms", ""),
+            "",
+        )
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,115 @@
+""" Cached, syntax highlighted views of the demo source code """
+
+# Standard Library
+import hashlib
+import inspect
+import os
+
+import six
+from pygments import highlight
+from pygments.lexers import PythonLexer
+
+
+class SourceCache(object):
+    """ Highlighted source code of view methods, keyed by view name.
+
+    An entry is computed the first time it is asked for and reused until
+    the modification time of the file it was read from changes."""
+
+    def __init__(self, formatter):
+        self.formatter = formatter
+        self.lexer = PythonLexer()
+        self.entries = {}
+
+    def get(self, name, method):
+        """ Return ``(html, start, end)`` for ``method``, the view
+        registered as ``name``, or the function it wraps if it is
+        decorated.  ``start`` and ``end`` are the line numbers delimiting
+        the method in its source file."""
+        entry = self.entries.get(name)
+        if entry is not None:
+            filename, mtime, result = entry
+            if os.stat(filename).st_mtime == mtime:
+                return result
+        # the source of a decorated view is that of the method it wraps
+        while hasattr(method, "__wrapped__"):
+            method = method.__wrapped__
+        filename = inspect.getsourcefile(method)
+        mtime = os.stat(filename).st_mtime
+        lines, start = inspect.getsourcelines(method)
+        end = start + len(lines)
+        code = "".join(lines)
+        if not isinstance(code, six.text_type):
+            code = code.decode("utf-8")
+        result = highlight(code, self.lexer, self.formatter), start, end
+        self.entries[name] = filename, mtime, result
+        return result
+
+
+class SourceListing(object):
+    """ A syntax highlighted, line numbered listing of the source file
+    defining ``obj``.
+
+    The file is tokenized once and kept as a list of per-line HTML
+    fragments, so rendering the listing with a window of highlighted lines
+    only concatenates strings.  The listing is rebuilt when the
+    modification time of the file changes."""
+
+    head = (
+        '<div class="highlight"><table class="highlighttable"><tr>'
+        '<td class="linenos"><div class="linenodiv"><pre>%s</pre></div></td>'
+        '<td class="code"><div><pre>'
+    )
+    tail = "</pre></div></td></tr></table></div>"
+
+    def __init__(self, obj, formatter):
+        self.obj = obj
+        self.formatter = formatter
+        self.lexer = PythonLexer()
+        self.filename = None
+        self.state = None
+
+    def refresh(self):
+        """ Retokenize the file if it changed and return its ``(mtime,
+        digest)``, suitable for use as cache validators."""
+        if self.filename is None:
+            self.filename = inspect.getsourcefile(self.obj)
+        mtime = os.stat(self.filename).st_mtime
+        state = self.state
+        if state is None or state[0] != mtime:
+            with open(self.filename, "rb") as f:
+                data = f.read()
+            html = highlight(data.decode("utf-8"), self.lexer, self.formatter)
+            # the formatter closes any open spans at the end of each line
+            lines = html.split("\n")[:-1]
+            anchors = [
+                '<a id="line-%d" name="line-%d"></a>' % (i, i)
+                for i in range(1, len(lines) + 1)
+            ]
+            anchored = [a + line + "\n" for a, line in zip(anchors, lines)]
+            linenos = "\n".join(str(i) for i in range(1, len(lines) + 1))
+            digest = hashlib.sha1(data).hexdigest()
+            head = self.head % linenos
+            state = mtime, digest, head, lines, anchors, anchored
+            self.state = state
+        return state[:2]
+
+    def render(self, start=None, end=None):
+        """ Return the listing as an HTML table, highlighting the lines
+        from ``start`` up to but not including ``end``."""
+        self.refresh()
+        mtime, digest, head, lines, anchors, anchored = self.state
+        parts = [head]
+        if start is None or end is None:
+            parts.extend(anchored)
+        else:
+            start = min(max(start - 1, 0), len(lines))
+            end = min(max(end - 1, start), len(lines))
+            parts.extend(anchored[:start])
+            for i in range(start, end):
+                parts.append(
+                    '%s<span class="hll">%s\n</span>' % (anchors[i], lines[i])
+                )
+            parts.extend(anchored[end:])
+        parts.append(self.tail)
+        return "".join(parts)
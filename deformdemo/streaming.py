@@ -0,0 +1,57 @@
+""" Streaming of demo pages, sending the page before the form is rendered """
+
+# Standard Library
+import uuid
+
+# Pyramid
+from pyramid.threadlocal import manager
+
+
+class StreamedForm(object):
+    """ The deferred rendering of a form, to be streamed in the middle of
+    its page.
+
+    The page template is rendered with :attr:`marker` in place of the
+    form.  :func:`stream_form` then replaces the body of the response with
+    an iterator which yields the page up to the marker, renders the form by
+    calling ``render`` and yields it, and finally yields the rest of the
+    page.  The WSGI server can send the head of the page and the sidebar
+    while the form is being rendered: this shortens the time to the first
+    byte, not the total time nor the memory used, as the form is still
+    rendered to one string.
+
+    The form is rendered after the response headers are sent, so its
+    ``render`` phase is missing from the ``Server-Timing`` header and the
+    statistics of :mod:`deformdemo.timing`."""
+
+    def __init__(self, request, render):
+        self.request = request
+        self.render = render
+        self.marker = "<!-- form %s -->" % uuid.uuid4().hex
+
+    def app_iter(self, body, charset):
+        head, found, tail = body.partition(self.marker.encode(charset))
+        yield head
+        if not found:
+            return
+        # the WSGI server iterates once the request is done; the translator
+        # of the form's renderer needs the current request
+        request = self.request
+        manager.push({"request": request, "registry": request.registry})
+        try:
+            html = self.render()
+        finally:
+            manager.pop()
+        yield html.encode(charset)
+        yield tail
+
+
+def stream_form(event):
+    """ Stream the response to a request which deferred the rendering of
+    its form (see :class:`StreamedForm`)."""
+    streamed = getattr(event.request, "streamed_form", None)
+    response = event.response
+    if streamed is None or response.status_int != 200:
+        return
+    response.app_iter = streamed.app_iter(response.body, response.charset)
+    response.content_length = None
@@ -3109,6 +3109,62 @@ class RedirectingAjaxFormTests(AjaxFormTests):
         self.assertTrue(browser.current_url.endswith("thanks.html"))
 
 
+class PartialAjaxFormTests(Base, unittest.TestCase):
+    url = test_url("/ajaxform_partial/")
+
+    def test_render_default(self):
+        self.assertEqual(findid("captured").text, "None")
+        self.assertEqual(
+            findid_view("deformField1").get_attribute("value"), ""
+        )
+        self.assertEqual(findid("deformField3").get_attribute("value"), "")
+        self.assertEqual(findid("deformField4").get_attribute("value"), "")
+
+    def test_submit_invalid(self):
+        findid("deformField1").send_keys("notanumber")
+        findid("deformField3").send_keys("name")
+        source = browser.page_source
+        wait_to_click("#deformsubmit")
+        wait_for_ajax(source)
+        self.assertEqual(
+            findid("error-deformField1").text, '"notanumber" is not a number'
+        )
+        self.assertEqual(findid("error-deformField4").text, "Required")
+        self.assertRaises(
+            NoSuchElementException, findcss, "#error-deformField3"
+        )
+        # only the fields in error were replaced
+        self.assertEqual(findid("deformField3").get_attribute("value"), "name")
+        self.assertEqual(findid("captured").text, "None")
+
+    def test_submit_fixed(self):
+        findid("deformField1").send_keys("notanumber")
+        source = browser.page_source
+        wait_to_click("#deformsubmit")
+        wait_for_ajax(source)
+        findid("deformField1").clear()
+        findid("deformField1").send_keys("1")
+        findid("deformField3").send_keys("name")
+        source = browser.page_source
+        wait_to_click("#deformsubmit")
+        wait_for_ajax(source)
+        self.assertRaises(
+            NoSuchElementException, findcss, "#error-deformField1"
+        )
+        self.assertEqual(findid("error-deformField4").text, "Required")
+
+    def test_submit_success(self):
+        findid("deformField1").send_keys("1")
+        findid("deformField3").send_keys("name")
+        findid("deformField4").send_keys("2010")
+        findid("deformField4-month").send_keys("1")
+        findid("deformField4-day").send_keys("1")
+        source = browser.page_source
+        wait_to_click("#deformsubmit")
+        wait_for_ajax(source)
+        self.assertEquals(findid("thanks").text, "Thanks!")
+
+
 class TextInputMaskTests(Base, unittest.TestCase):
     url = test_url("/text_input_masks/")
 
@@ -3186,6 +3242,54 @@ class CssClassesOnTheOutermostHTMLElementTests(Base, unittest.TestCase):
         findcss("[title=SequenceWidget] div.sequenced_widget_custom_class")
 
 
+class StressMappingTests(Base, unittest.TestCase):
+    url = test_url("/stress_mapping/?n=3")
+
+    def test_render_default(self):
+        self.assertEqual(len(findxpaths('//input[@type="text"]')), 3)
+        self.assertEqual(
+            findid("deformField3").get_attribute("value"), "value 2"
+        )
+        self.assertEqual(findid("captured").text, "None")
+
+    def test_submit_default(self):
+        wait_to_click("#deformsubmit")
+        self.assertEqual(
+            eval(findid("captured").text),
+            {"field0": "value 0", "field1": "value 1", "field2": "value 2"},
+        )
+
+
+class StressSequenceOfMappingsTests(Base, unittest.TestCase):
+    url = test_url("/stress_sequence_of_mappings/?n=5")
+
+    def test_render_default(self):
+        self.assertEqual(len(findxpaths('//input[@name="name"]')), 5)
+        self.assertEqual(findid("captured").text, "None")
+
+    def test_submit_default(self):
+        wait_to_click("#deformsubmit")
+        captured = eval(findid("captured").text)
+        self.assertEqual(len(captured["people"]), 5)
+        self.assertEqual(captured["people"][4], {"name": "Person 4", "age": 4})
+
+
+class StressSequenceOfSequencesTests(Base, unittest.TestCase):
+    url = test_url("/stress_sequence_of_sequences/?depth=2&n=2")
+
+    def test_render_default(self):
+        self.assertEqual(len(findxpaths('//input[@name="title"]')), 4)
+        self.assertEqual(findid("captured").text, "None")
+
+    def test_submit_default(self):
+        wait_to_click("#deformsubmit")
+        item = {"name": "name", "title": "title"}
+        self.assertEqual(
+            eval(findid("captured").text),
+            {"level1": [[item, item], [item, item]]},
+        )
+
+
 if __name__ == "__main__":
     setUpModule()
     try:
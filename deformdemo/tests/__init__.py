@@ -0,0 +1 @@
+""" Unit tests, which need neither a browser nor a running server """
@@ -0,0 +1,42 @@
+""" Tests of the static asset helpers """
+
+# Standard Library
+import unittest
+
+from webob import Request
+
+# Deform Demo
+from deformdemo import main
+from deformdemo.assets import FAR_FUTURE
+from deformdemo.assets import SHORT_MAX_AGE
+
+
+class CacheBustedForeverTests(unittest.TestCase):
+    path = "/static_deform/scripts/deform.js"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = main({})
+
+    def get(self, url):
+        response = Request.blank(url).get_response(self.app)
+        self.assertEqual(response.status_int, 200)
+        return response.headers["Cache-Control"]
+
+    def test_current_token(self):
+        cache_buster = self.app.registry.cache_busted_patterns[
+            "static_deform/*subpath"
+        ]
+        token = cache_buster.manifest["scripts/deform.js"]
+        cache_control = self.get(self.path + "?x=" + token)
+        self.assertEqual(
+            cache_control, "public, max-age=%d, immutable" % FAR_FUTURE
+        )
+
+    def test_other_token(self):
+        cache_control = self.get(self.path + "?x=bogus")
+        self.assertEqual(cache_control, "max-age=%d" % SHORT_MAX_AGE)
+
+    def test_no_token(self):
+        cache_control = self.get(self.path)
+        self.assertEqual(cache_control, "max-age=%d" % SHORT_MAX_AGE)
@@ -0,0 +1,112 @@
+""" Tests of the caches of forms and of rendered markup """
+
+# Standard Library
+import unittest
+
+# Pyramid
+import colander
+from pyramid import testing
+
+# Deform
+import deform
+
+# Deform Demo
+from deformdemo.caching import FormPrototype
+from deformdemo.caching import LRUCache
+
+
+def make_form():
+    class Item(colander.Schema):
+        name = colander.SchemaNode(colander.String())
+        count = colander.SchemaNode(colander.Integer())
+
+    class Items(colander.SequenceSchema):
+        item = Item()
+
+    class Schema(colander.Schema):
+        title = colander.SchemaNode(colander.String())
+        items = Items()
+
+    return deform.Form(Schema(), buttons=("submit",))
+
+
+# a submission which adds two items to the sequence, the second invalid
+CONTROLS = [
+    ("title", "Title"),
+    ("__start__", "items:sequence"),
+    ("__start__", "item:mapping"),
+    ("name", "one"),
+    ("count", "1"),
+    ("__end__", "item:mapping"),
+    ("__start__", "item:mapping"),
+    ("name", "two"),
+    ("count", "two"),
+    ("__end__", "item:mapping"),
+    ("__end__", "items:sequence"),
+]
+
+
+class FormPrototypeTests(unittest.TestCase):
+    def setUp(self):
+        # main() may have configured the renderer to translate with the
+        # current request
+        testing.setUp(request=testing.DummyRequest())
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def test_clone_renders_like_a_new_form(self):
+        prototype = FormPrototype(make_form())
+        self.assertEqual(prototype.clone().render(), make_form().render())
+
+    def test_clone_fails_validation_like_a_new_form(self):
+        prototype = FormPrototype(make_form())
+        markup = []
+        for form in (prototype.clone(), make_form()):
+            with self.assertRaises(deform.ValidationFailure) as failure:
+                form.validate(CONTROLS)
+            markup.append(failure.exception.render())
+        self.assertEqual(markup[0], markup[1])
+
+    def test_clones_share_no_state(self):
+        prototype = FormPrototype(make_form())
+        first = prototype.clone()
+        second = prototype.clone()
+        self.assertRaises(deform.ValidationFailure, first.validate, CONTROLS)
+        self.assertTrue(first.error is not None)
+        self.assertEqual(len(first["items"].sequence_fields), 2)
+        fresh = make_form()
+        for form in (prototype.form, second):
+            self.assertTrue(form.error is None)
+            self.assertEqual(form.cstruct, fresh.cstruct)
+            self.assertEqual(form["title"].cstruct, colander.null)
+            self.assertFalse(getattr(form["items"], "sequence_fields", []))
+            self.assertTrue(form["items"].error is None)
+        # the pristine clone still renders an empty form
+        self.assertEqual(second.render(), make_form().render())
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_eviction_order(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        # getting "a" makes "b" the least recently used
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        # setting an entry again uses it too
+        cache.set("a", 4)
+        cache.set("d", 5)
+        self.assertEqual(list(cache.entries), ["a", "d"])
+        self.assertEqual(cache.get("a"), 4)
+        self.assertEqual(len(cache), 2)
+
+    def test_hits_and_misses(self):
+        cache = LRUCache(1)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b", "default")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
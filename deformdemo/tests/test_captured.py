@@ -0,0 +1,60 @@
+""" Tests of the display of captured submissions """
+
+# Standard Library
+import pprint
+import unittest
+
+from pygments.formatters import HtmlFormatter
+
+# Deform Demo
+from deformdemo.captured import CapturedFormatter
+from deformdemo.captured import escape
+
+
+class CapturedFormatterTests(unittest.TestCase):
+    def make_formatter(self, **kw):
+        return CapturedFormatter(HtmlFormatter(nowrap=True), **kw)
+
+    def test_like_pprint(self):
+        formatter = self.make_formatter()
+        for obj in (
+            None,
+            [],
+            {},
+            [1],
+            (1,),
+            ("one", 2),
+            {"b": [1, "two", (3,)], "a": {"x": None, "y": {2, 1}}},
+            {"c": (), "d": frozenset([1]), 1: "mixed"},
+            [{"name": "one", "items": [1, 2]}, {"name": "two", "items": []}],
+        ):
+            self.assertEqual(
+                formatter.pformat(obj), pprint.pformat(obj, width=1)
+            )
+
+    def test_max_depth(self):
+        formatter = self.make_formatter(max_depth=2)
+        self.assertEqual(formatter.pformat([[[1]]]), "[[[...]]]")
+        # empty containers are shown whatever their depth
+        self.assertEqual(formatter.pformat([[[]]]), "[[[]]]")
+
+    def test_max_items(self):
+        formatter = self.make_formatter(max_items=2)
+        self.assertEqual(formatter.pformat([1, 2, 3]), "[1,\n 2,\n ...]")
+        self.assertEqual(formatter.pformat([1, 2]), "[1,\n 2]")
+
+    def test_max_size(self):
+        formatter = self.make_formatter(max_size=10)
+        output = formatter.pformat(list(range(100)))
+        self.assertEqual(output, "[0,\n 1,\n 2\n... (truncated)")
+        self.assertEqual(formatter.pformat([1, 2]), "[1,\n 2]")
+
+    def test_highlighted(self):
+        formatter = self.make_formatter()
+        self.assertTrue('<span class="' in formatter({"a": 1}))
+
+    def test_escaped_above_highlight_limit(self):
+        formatter = self.make_formatter(highlight_limit=10)
+        obj = {"<script>": "&"}
+        self.assertEqual(formatter(obj), escape(formatter.pformat(obj)))
+        self.assertFalse("<span" in formatter(obj))
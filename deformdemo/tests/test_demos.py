@@ -0,0 +1,101 @@
+""" Tests of the caching and timing done by the demo views """
+
+# Standard Library
+import unittest
+
+# Pyramid
+from pyramid import testing
+
+from webob import Request
+
+# Deform Demo
+from deformdemo import DeformDemo
+from deformdemo import main
+from deformdemo.tests.test_caching import make_form
+
+
+class RecordPrototypeTests(unittest.TestCase):
+    def setUp(self):
+        self.request = testing.DummyRequest()
+        self.request.registry.form_prototypes = {}
+        self.request.registry.timing_stats = None
+        self.demo = DeformDemo(self.request)
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def test_arguments_kept(self):
+        self.demo.record_prototype("textinput", make_form(), readonly=True)
+        _, kw = self.request.registry.form_prototypes["textinput"]
+        self.assertEqual(kw, {"readonly": True})
+
+    def test_success_not_replayed(self):
+        self.demo.record_prototype(
+            "textinput", make_form(), success=lambda: None
+        )
+        prototype, kw = self.request.registry.form_prototypes["textinput"]
+        self.assertTrue(kw is None)
+        # the prototype still serves the validate_field view
+        self.assertTrue(prototype.clone() is not None)
+
+    def test_success_replayed_on_opt_in(self):
+        self.demo.record_prototype("file", make_form(), success=self.succeed)
+        _, kw = self.request.registry.form_prototypes["file"]
+        self.assertEqual(kw, {"success": self.succeed})
+
+    def succeed(self):
+        pass
+
+
+class RenderFragmentTests(unittest.TestCase):
+    def setUp(self):
+        self.app = main({})
+        self.cache = self.app.registry.fragment_cache
+
+    def request(self, url, **kw):
+        response = Request.blank(url, **kw).get_response(self.app)
+        self.assertEqual(response.status_int, 200)
+        return response
+
+    def test_get_cached(self):
+        first = self.request("/textinput/")
+        self.assertEqual(len(self.cache), 1)
+        second = self.request("/textinput/")
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(first.body, second.body)
+
+    def test_dynamic_demo_not_cached(self):
+        self.request("/dynamic_field/")
+        self.request("/dynamic_field/")
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.hits + self.cache.misses, 0)
+
+    def test_post_not_cached(self):
+        # a POST without the submit button renders the form unvalidated
+        self.request("/textinput/", POST={"text": "text"})
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.hits + self.cache.misses, 0)
+
+
+class ServerTimingTests(unittest.TestCase):
+    def get(self, app, url):
+        response = Request.blank(url).get_response(app)
+        self.assertEqual(response.status_int, 200)
+        return response
+
+    def test_off(self):
+        response = self.get(main({}), "/textinput/")
+        self.assertFalse("Server-Timing" in response.headers)
+
+    def test_on(self):
+        app = main({}, **{"deformdemo.server_timing": "true"})
+        response = self.get(app, "/textinput/")
+        phases = [
+            phase.split(";")[0]
+            for phase in response.headers["Server-Timing"].split(", ")
+        ]
+        self.assertEqual(phases[0], "build")
+        self.assertEqual(phases[-1], "template")
+        stats = app.registry.timing_stats.snapshot()
+        self.assertEqual(stats["textinput"]["template"]["count"], 1)
@@ -0,0 +1,61 @@
+""" Tests of the highlighted listings of the demo source code """
+
+# Standard Library
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from pygments.formatters import HtmlFormatter
+
+# Deform Demo
+from deformdemo.source import SourceListing
+
+
+HIGHLIGHTED = re.compile(r'<a id="line-(\d+)"[^>]*></a><span class="hll">')
+
+SOURCE = "one = 1\ntwo = 2\nthree = 3\nfour = 4\nfive = 5\n"
+
+
+class SourceListingTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.listing = SourceListing(None, HtmlFormatter(nowrap=True))
+        self.listing.filename = os.path.join(self.directory, "module.py")
+        with open(self.listing.filename, "w") as f:
+            f.write(SOURCE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def highlighted(self, start, end):
+        html = self.listing.render(start, end)
+        # every line is listed once, whether highlighted or not
+        for i in range(1, 6):
+            self.assertEqual(html.count('<a id="line-%d"' % i), 1)
+        return [int(i) for i in HIGHLIGHTED.findall(html)]
+
+    def test_no_window(self):
+        self.assertEqual(self.highlighted(None, None), [])
+        self.assertEqual(self.highlighted(2, None), [])
+
+    def test_window(self):
+        # from start up to but not including end
+        self.assertEqual(self.highlighted(2, 4), [2, 3])
+        self.assertEqual(self.highlighted(1, 6), [1, 2, 3, 4, 5])
+
+    def test_out_of_range(self):
+        self.assertEqual(self.highlighted(0, 3), [1, 2])
+        self.assertEqual(self.highlighted(-5, 100), [1, 2, 3, 4, 5])
+        self.assertEqual(self.highlighted(4, 100), [4, 5])
+        self.assertEqual(self.highlighted(10, 20), [])
+        self.assertEqual(self.highlighted(4, 2), [])
+
+    def test_refresh(self):
+        mtime, digest = self.listing.refresh()
+        with open(self.listing.filename, "a") as f:
+            f.write("six = 6\n")
+        os.utime(self.listing.filename, (mtime + 10, mtime + 10))
+        self.assertNotEqual(self.listing.refresh()[1], digest)
+        self.assertTrue('<a id="line-6"' in self.listing.render())
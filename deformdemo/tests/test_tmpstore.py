@@ -0,0 +1,260 @@
+""" Tests of the stores of uploaded files """
+
+# Standard Library
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+
+# Deform Demo
+from deformdemo.tmpstore import FileSystemTmpStore
+from deformdemo.tmpstore import MemoryTmpStore
+from deformdemo.tmpstore import SessionTmpStore
+from deformdemo.tmpstore import SpooledFile
+from deformdemo.tmpstore import SpooledTmpStore
+
+
+def upload(data):
+    return {"filename": "upload.txt", "fp": BytesIO(data)}
+
+
+class MemoryTmpStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def test_max_entries(self):
+        store = MemoryTmpStore(max_entries=2, clock=self.clock)
+        store["a"] = upload(b"a")
+        store["b"] = upload(b"b")
+        store["a"]
+        store["c"] = upload(b"c")
+        # "b" is the least recently used
+        self.assertTrue("a" in store)
+        self.assertFalse("b" in store)
+        self.assertTrue("c" in store)
+        stats = store.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_max_bytes(self):
+        store = MemoryTmpStore(max_bytes=10, clock=self.clock)
+        store["a"] = upload(b"x" * 6)
+        store["b"] = upload(b"x" * 6)
+        self.assertFalse("a" in store)
+        self.assertEqual(store.stats()["bytes"], 6)
+        self.assertEqual(store.stats()["evictions"], 1)
+        # the upload stored last is kept, whatever its size
+        store["c"] = upload(b"x" * 20)
+        self.assertEqual(list(store.entries), ["c"])
+        self.assertEqual(store.stats()["bytes"], 20)
+        self.assertEqual(store.stats()["evictions"], 2)
+
+    def test_ttl(self):
+        store = MemoryTmpStore(ttl=10, clock=self.clock)
+        store["a"] = upload(b"a")
+        store["b"] = upload(b"b")
+        self.now = 6
+        store["a"]
+        self.now = 11
+        # "a" was used 5 seconds ago, "b" 11 seconds ago
+        self.assertTrue("a" in store)
+        self.assertRaises(KeyError, store.__getitem__, "b")
+        stats = store.stats()
+        self.assertEqual(stats["entries"], 1)
+        self.assertEqual(stats["expirations"], 1)
+        self.assertEqual(stats["evictions"], 0)
+
+    def test_hits_and_misses(self):
+        store = MemoryTmpStore(clock=self.clock)
+        store["a"] = upload(b"a")
+        store["a"]
+        self.assertEqual(store.get("b"), None)
+        stats = store.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+
+class SpooledTmpStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.now = 0.0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def clock(self):
+        return self.now
+
+    def make_store(self, **kw):
+        kw.setdefault("threshold", 4)
+        return SpooledTmpStore(self.directory, clock=self.clock, **kw)
+
+    def test_threshold(self):
+        store = self.make_store()
+        store["small"] = upload(b"abcd")
+        store["large"] = upload(b"abcde")
+        self.assertFalse(isinstance(store["small"]["fp"], SpooledFile))
+        fp = store["large"]["fp"]
+        self.assertTrue(isinstance(fp, SpooledFile))
+        self.assertEqual(os.path.dirname(fp.path), self.directory)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        self.assertEqual(store["large"]["size"], 5)
+
+    def test_no_threshold(self):
+        store = self.make_store(threshold=None)
+        store["a"] = upload(b"x" * 100)
+        self.assertFalse(isinstance(store["a"]["fp"], SpooledFile))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_read_back(self):
+        store = self.make_store()
+        store["a"] = upload(b"one\ntwo\nthree")
+        fp = store["a"]["fp"]
+        self.assertEqual(fp.read(4), b"one\n")
+        self.assertEqual(fp.tell(), 4)
+        self.assertEqual(fp.readline(), b"two\n")
+        self.assertEqual(fp.read(), b"three")
+        fp.seek(-5, os.SEEK_END)
+        self.assertEqual(fp.tell(), 8)
+        self.assertEqual(fp.read(), b"three")
+        fp.seek(0)
+        self.assertEqual(list(fp), [b"one\n", b"two\n", b"three"])
+        fp.close()
+
+    def test_spooled_bytes_not_counted(self):
+        store = self.make_store(max_bytes=10)
+        store["a"] = upload(b"x" * 100)
+        store["b"] = upload(b"x" * 100)
+        store["c"] = upload(b"xyz")
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.stats()["bytes"], 3)
+        self.assertEqual(store.stats()["evictions"], 0)
+
+    def test_removed_when_evicted(self):
+        store = self.make_store(max_entries=1)
+        store["a"] = upload(b"x" * 100)
+        path = store["a"]["fp"].path
+        store["b"] = upload(b"y")
+        self.assertFalse(os.path.exists(path))
+
+    def test_removed_when_expired(self):
+        store = self.make_store(ttl=10)
+        store["a"] = upload(b"x" * 100)
+        path = store["a"]["fp"].path
+        self.now = 11
+        self.assertFalse("a" in store)
+        self.assertFalse(os.path.exists(path))
+
+    def test_removed_when_replaced(self):
+        store = self.make_store()
+        store["a"] = upload(b"x" * 100)
+        path = store["a"]["fp"].path
+        store["a"] = upload(b"y" * 100)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(store["a"]["fp"].read(), b"y" * 100)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_same_value_stored_again(self):
+        # the widget stores the value it read back, under the same uid or
+        # under another one
+        store = self.make_store()
+        store["a"] = upload(b"x" * 100)
+        value = store["a"]
+        store["a"] = value
+        store["b"] = value
+        self.assertTrue(os.path.exists(value["fp"].path))
+        del store["a"]
+        self.assertEqual(store["b"]["fp"].read(), b"x" * 100)
+        del store["b"]
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_empty_spooled_file(self):
+        path = os.path.join(self.directory, "empty")
+        open(path, "wb").close()
+        fp = SpooledFile(path, 0)
+        self.assertEqual(fp.read(), b"")
+        self.assertEqual(fp.tell(), 0)
+
+
+class DummyRequest(object):
+    def __init__(self):
+        self.session = {}
+
+
+class SessionTmpStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.request = None
+        self.store = SessionTmpStore(
+            MemoryTmpStore(), get_request=lambda: self.request
+        )
+
+    def test_clear_keeps_other_sessions_uploads(self):
+        alice = DummyRequest()
+        bob = DummyRequest()
+        # both upload a file whose form then fails to validate
+        self.request = alice
+        self.store["uid"] = upload(b"alice")
+        self.request = bob
+        self.store["uid"] = upload(b"bob")
+        # bob's submission succeeds and clears his uploads only
+        self.store.clear()
+        self.assertFalse("uid" in self.store)
+        self.request = alice
+        self.assertEqual(self.store["uid"]["fp"].read(), b"alice")
+
+    def test_outside_of_a_request(self):
+        self.store["uid"] = upload(b"data")
+        self.assertTrue("uid" in self.store)
+        self.request = DummyRequest()
+        self.assertFalse("uid" in self.store)
+
+
+class FileSystemTmpStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_empty_upload(self):
+        store = FileSystemTmpStore(self.directory)
+        store["one"] = {"filename": "empty.txt", "fp": BytesIO(b"")}
+        value = store["one"]
+        self.assertEqual(value["fp"].read(), b"")
+        # storing it again, e.g. under another session's uid, reads it back
+        store["two"] = value
+        self.assertEqual(store["two"]["fp"].read(), b"")
+        self.assertEqual(store["two"]["size"], 0)
+
+    def test_any_uid(self):
+        store = FileSystemTmpStore(self.directory)
+        for uid in ("", "../a", "a/b", u"\xe9"):
+            store[uid] = upload(b"a")
+            self.assertEqual(store[uid]["fp"].read(), b"a")
+        self.assertEqual(store.stats()["entries"], 4)
+        self.assertEqual(len(os.listdir(self.directory)), 8)
+
+    def test_bounds_shared_between_stores(self):
+        one = FileSystemTmpStore(self.directory, max_entries=2, ttl=None)
+        two = FileSystemTmpStore(self.directory, max_entries=2, ttl=None)
+        one["a"] = upload(b"a")
+        one["b"] = upload(b"b")
+        # make "a" the least recently used
+        os.utime(one.paths(one.key("a"))[0], (1, 1))
+        two["c"] = upload(b"c")
+        self.assertFalse("a" in one)
+        self.assertTrue("b" in one)
+        self.assertEqual(one["c"]["fp"].read(), b"c")
+        self.assertEqual(two.stats()["evictions"], 1)
+
+    def test_ttl(self):
+        store = FileSystemTmpStore(self.directory, ttl=10)
+        store["a"] = upload(b"a")
+        os.utime(store.paths(store.key("a"))[0], (1, 1))
+        self.assertRaises(KeyError, store.__getitem__, "a")
+        self.assertEqual(store.stats()["expirations"], 1)
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,117 @@
+""" Timing of the phases of rendering a demo, reported in a Server-Timing
+header and aggregated per demo """
+
+# Standard Library
+import threading
+import time
+
+
+timer = getattr(time, "perf_counter", time.time)
+
+#: Descriptions of the phases shown by browser developer tools
+PHASES = {
+    "build": "schema and form",
+    "validate": "deserialize and validate",
+    "render": "form.render",
+    "code": "get_code",
+    "captured": "captured submission",
+    "resources": "widget resources",
+    "template": "page template",
+}
+
+
+class PhaseTimer(object):
+    """ The durations of the successive phases of a request, each phase
+    ending when it is marked.  The first phase starts at ``start``."""
+
+    def __init__(self, start=None):
+        self.last = timer() if start is None else start
+        self.phases = []
+        self.pending = None
+
+    def mark(self, name):
+        now = timer()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def defer(self, name):
+        """ Let the phase ``name`` be ended once the response is made, by
+        :func:`add_server_timing`. """
+        self.pending = name
+
+    def header(self):
+        """ Return the phases as the value of a Server-Timing header. """
+        return ", ".join(
+            '%s;desc="%s";dur=%.3f' % (name, PHASES.get(name, name), s * 1000)
+            for name, s in self.phases
+        )
+
+
+class NullTimer(object):
+    """ Stands in for a :class:`PhaseTimer` when timing is off. """
+
+    def mark(self, name):
+        pass
+
+    def defer(self, name):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class TimingStats(object):
+    """ Thread safe counters of the number of times each phase of each
+    demo was timed, and their total and longest durations."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def add(self, name, phases):
+        with self.lock:
+            counters = self.counters.setdefault(name, {})
+            for phase, seconds in phases:
+                counter = counters.get(phase)
+                if counter is None:
+                    counter = counters[phase] = [0, 0.0, 0.0]
+                counter[0] += 1
+                counter[1] += seconds
+                counter[2] = max(counter[2], seconds)
+
+    def snapshot(self):
+        """ Return the counters as ``{demo: {phase: {"count", "total_ms",
+        "mean_ms", "max_ms"}}}``."""
+        snapshot = {}
+        with self.lock:
+            for name, counters in self.counters.items():
+                snapshot[name] = phases = {}
+                for phase, (count, total, longest) in counters.items():
+                    phases[phase] = {
+                        "count": count,
+                        "total_ms": round(total * 1000, 3),
+                        "mean_ms": round(total * 1000 / count, 3),
+                        "max_ms": round(longest * 1000, 3),
+                    }
+        return snapshot
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+
+
+def add_server_timing(event):
+    """ End the pending phase of a request timed by ``render_form``, send
+    its phases in a Server-Timing header and add them to
+    ``registry.timing_stats``.  The form of a streamed page is rendered
+    after this, so such pages have no ``render`` phase."""
+    request = event.request
+    phases = getattr(request, "phases", None)
+    stats = request.registry.timing_stats
+    if phases is None or stats is None:
+        return
+    if phases.pending is not None:
+        phases.mark(phases.pending)
+        phases.pending = None
+    event.response.headers["Server-Timing"] = phases.header()
+    stats.add(request.view_name, phases.phases)
@@ -0,0 +1,616 @@
+""" Temporary stores for the files uploaded through
+:class:`deform.widget.FileUploadWidget` """
+
+# Standard Library
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Pyramid
+from pyramid.settings import asbool
+from pyramid.threadlocal import get_current_request
+
+
+def upload_size(value):
+    """ Return the size in bytes of the upload described by ``value``, a
+    file dictionary made by the widget, as far as it can be told."""
+    try:
+        size = value.get("size")
+    except AttributeError:
+        return 0
+    if size is not None and size >= 0:
+        return size
+    fp = value.get("fp")
+    if fp is None:
+        return 0
+    try:
+        position = fp.tell()
+        fp.seek(0, os.SEEK_END)
+        size = fp.tell()
+        fp.seek(position)
+    except (AttributeError, IOError, ValueError):
+        return 0
+    return size
+
+
+class MemoryTmpStore(object):
+    """ A :class:`deform.interfaces.FileUploadTempStore` keeping uploads in
+    memory, within bounds.
+
+    The store holds at most ``max_entries`` uploads of at most
+    ``max_bytes`` in total, forgetting the least recently used ones first,
+    and forgets uploads not used for ``ttl`` seconds.  The upload stored
+    last is always kept, even if it is larger than ``max_bytes`` on its
+    own: the widget reads it back right away.  A bound of ``None`` is no
+    bound.
+
+    Instances are thread safe; :meth:`stats` returns counters describing
+    their use."""
+
+    def __init__(
+        self,
+        max_entries=1000,
+        max_bytes=64 * 1024 * 1024,
+        ttl=3600,
+        clock=time.time,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # uid -> (value, size, last used)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def __contains__(self, uid):
+        with self.lock:
+            self.expire()
+            return uid in self.entries
+
+    def __getitem__(self, uid):
+        with self.lock:
+            self.expire()
+            try:
+                value, size, _ = self.entries.pop(uid)
+            except KeyError:
+                self.misses += 1
+                raise
+            self.entries[uid] = value, size, self.clock()
+            self.hits += 1
+            return value
+
+    def get(self, uid, default=None):
+        try:
+            return self[uid]
+        except KeyError:
+            return default
+
+    def __setitem__(self, uid, value):
+        size = self.size_of(value)
+        with self.lock:
+            self.expire()
+            self.discard(uid)
+            self.entries[uid] = value, size, self.clock()
+            self.bytes += size
+            while len(self.entries) > 1 and self.over_bounds():
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def over_bounds(self):
+        if self.max_entries is not None:
+            if len(self.entries) > self.max_entries:
+                return True
+        return self.max_bytes is not None and self.bytes > self.max_bytes
+
+    def __delitem__(self, uid):
+        with self.lock:
+            if not self.discard(uid):
+                raise KeyError(uid)
+
+    def size_of(self, value):
+        # the bytes ``value`` counts against ``max_bytes``
+        return upload_size(value)
+
+    def discard(self, uid):
+        entry = self.entries.pop(uid, None)
+        if entry is None:
+            return False
+        self.bytes -= entry[1]
+        return True
+
+    def expire(self):
+        # entries are kept in order of last use, so the expired ones are
+        # at the front
+        if self.ttl is None:
+            return
+        deadline = self.clock() - self.ttl
+        while self.entries:
+            uid = next(iter(self.entries))
+            if self.entries[uid][2] > deadline:
+                break
+            self.discard(uid)
+            self.expirations += 1
+
+    def clear(self):
+        with self.lock:
+            for uid in list(self.entries):
+                self.discard(uid)
+
+    def preview_url(self, uid):
+        return None
+
+    def stats(self):
+        with self.lock:
+            self.expire()
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SpooledFile(object):
+    """ A read-only file object over an upload spooled to ``path``.  The
+    file is mapped into memory when it is first read, so its content is
+    paged in by the operating system rather than copied onto the heap.
+    Empty files, which cannot be mapped, are read as an empty buffer."""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.mapped = None
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self.path)
+
+    def map(self):
+        if self.mapped is None:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    # an empty file cannot be mapped
+                    self.mapped = io.BytesIO()
+                else:
+                    # the mapping stays valid once the file is closed, and
+                    # even once it is removed
+                    self.mapped = mmap.mmap(
+                        f.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+        return self.mapped
+
+    def read(self, size=-1):
+        mapped = self.map()
+        if size is None or size < 0:
+            size = self.size - mapped.tell()
+        return mapped.read(size)
+
+    def readline(self):
+        return self.map().readline()
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.map().seek(offset, whence)
+
+    def tell(self):
+        return self.map().tell()
+
+    def close(self):
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+
+
+class SpooledTmpStore(MemoryTmpStore):
+    """ A :class:`MemoryTmpStore` which writes uploads larger than
+    ``threshold`` bytes to a file in ``directory`` and keeps only their
+    description in memory, with a :class:`SpooledFile` as ``fp``.  Spooled
+    uploads do not count against ``max_bytes``; their files are removed
+    once no entry refers to them, when they are evicted, expire or are
+    replaced.
+
+    A ``threshold`` of ``None`` keeps every upload in memory."""
+
+    def __init__(self, directory=None, threshold=1024 * 1024, **kw):
+        super(SpooledTmpStore, self).__init__(**kw)
+        if directory is None:
+            directory = os.path.join(
+                tempfile.gettempdir(), "deformdemo-uploads"
+            )
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = os.path.abspath(directory)
+        self.threshold = threshold
+        # path of a spooled file -> number of entries referring to it; the
+        # widget stores the same value again, sometimes under another uid
+        self.references = {}
+        self.references_lock = threading.Lock()
+
+    def __setitem__(self, uid, value):
+        if (
+            self.threshold is not None
+            and isinstance(value, dict)
+            and value.get("fp") is not None
+            and not self.is_spooled(value)
+            and upload_size(value) > self.threshold
+        ):
+            value = self.spool(value, value["fp"])
+        if self.is_spooled(value):
+            # counted before the entry it replaces is discarded
+            self.refer(value["fp"].path, 1)
+        super(SpooledTmpStore, self).__setitem__(uid, value)
+
+    def refer(self, path, count):
+        # return whether entries still refer to the file at ``path``
+        with self.references_lock:
+            count += self.references.get(path, 0)
+            if count > 0:
+                self.references[path] = count
+                return True
+            self.references.pop(path, None)
+            return False
+
+    def spool(self, value, fp):
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix=".upload")
+        position = fp.tell()
+        fp.seek(0)
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(fp, f)
+            size = f.tell()
+        fp.seek(position)
+        # keep the type of the widget's file dictionary
+        spooled = value.__class__(value)
+        spooled["fp"] = SpooledFile(path, size)
+        spooled["size"] = size
+        return spooled
+
+    def is_spooled(self, value):
+        return isinstance(value, dict) and isinstance(
+            value.get("fp"), SpooledFile
+        )
+
+    def size_of(self, value):
+        if self.is_spooled(value):
+            return 0
+        return upload_size(value)
+
+    def discard(self, uid):
+        entry = self.entries.get(uid)
+        if not super(SpooledTmpStore, self).discard(uid):
+            return False
+        if self.is_spooled(entry[0]):
+            path = entry[0]["fp"].path
+            if not self.refer(path, -1):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return True
+
+
+class FileSystemTmpStore(object):
+    """ A :class:`deform.interfaces.FileUploadTempStore` keeping uploads in
+    ``directory``, so that every process of a deployment sharing the
+    directory sees the same uploads.
+
+    Each upload is kept as two files named after a hash of its ``uid``,
+    which comes from the client: ``<key>.data``, its content, and
+    ``<key>.json``, the rest of its description.  Both are written under a
+    temporary name and renamed into place, content first, so that other
+    processes never see a partial upload.  The content is read back as a
+    :class:`SpooledFile`.  The modification time of the description is the
+    time of last use.
+
+    The bounds are those of :class:`MemoryTmpStore`; they are enforced
+    whenever an upload is stored, by removing the uploads used least
+    recently.  Changes made to a description after it was stored, such as
+    the ``preview_url`` the widget sets, are not saved.  Instances are
+    thread safe; :meth:`stats` counts hits and misses of this process
+    only."""
+
+    valid_key = re.compile(r"^[0-9a-f]{40}$")
+
+    def __init__(
+        self,
+        directory,
+        max_entries=1000,
+        max_bytes=64 * 1024 * 1024,
+        ttl=3600,
+        clock=time.time,
+    ):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = os.path.abspath(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def key(self, uid):
+        """ Return the name of the files of the upload ``uid``. """
+        if not isinstance(uid, bytes):
+            uid = uid.encode("utf-8")
+        return hashlib.sha1(uid).hexdigest()
+
+    def paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".data"
+
+    def count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def expired(self, mtime):
+        return self.ttl is not None and mtime <= self.clock() - self.ttl
+
+    def load(self, uid):
+        key = self.key(uid)
+        meta, data = self.paths(key)
+        try:
+            with open(meta, "rb") as f:
+                value = json.loads(f.read().decode("utf-8"))
+            mtime = os.stat(meta).st_mtime
+        except (IOError, OSError, ValueError):
+            raise KeyError(uid)
+        if self.expired(mtime):
+            self.remove(key)
+            self.count("expirations")
+            raise KeyError(uid)
+        if value.pop("_content", False):
+            if not os.path.exists(data):
+                raise KeyError(uid)
+            value["fp"] = SpooledFile(data, value.get("size") or 0)
+        return value
+
+    def __getitem__(self, uid):
+        try:
+            value = self.load(uid)
+        except KeyError:
+            self.count("misses")
+            raise
+        try:
+            # mark as used
+            os.utime(self.paths(self.key(uid))[0], None)
+        except OSError:
+            pass
+        self.count("hits")
+        return value
+
+    def get(self, uid, default=None):
+        try:
+            return self[uid]
+        except KeyError:
+            return default
+
+    def __contains__(self, uid):
+        try:
+            self.load(uid)
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, uid, value):
+        key = self.key(uid)
+        meta, data = self.paths(key)
+        value = dict(value)
+        fp = value.pop("fp", None)
+        value.pop("_content", None)
+        if isinstance(fp, SpooledFile) and fp.path == data:
+            # stored already, unless it was removed since it was read
+            value["_content"] = os.path.exists(data)
+            if not value["_content"] and fp.mapped is not None:
+                value["size"] = self.write(data, fp)
+                value["_content"] = True
+        elif fp is not None:
+            value["size"] = self.write(data, fp)
+            value["_content"] = True
+        description = json.dumps(value, default=str).encode("utf-8")
+        self.write(meta, description)
+        self.sweep(keep=key)
+
+    def write(self, path, content):
+        """ Atomically replace ``path`` by ``content``, a byte string or a
+        file object.  Return the number of bytes written."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(content, bytes):
+                f.write(content)
+            else:
+                position = content.tell()
+                content.seek(0)
+                shutil.copyfileobj(content, f)
+                content.seek(position)
+            size = f.tell()
+        os.rename(tmp, path)
+        return size
+
+    def __delitem__(self, uid):
+        if not self.remove(self.key(uid)):
+            raise KeyError(uid)
+
+    def remove(self, key):
+        # the description goes first: without it, the content is not found
+        removed = False
+        for path in self.paths(key):
+            try:
+                os.remove(path)
+                removed = True
+            except OSError:
+                pass
+        return removed
+
+    def scan(self):
+        """ Return ``(mtime, key, size)`` for every upload, oldest first. """
+        uploads = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            key = filename[: -len(".json")]
+            if not self.valid_key.match(key):
+                continue
+            meta, data = self.paths(key)
+            try:
+                mtime = os.stat(meta).st_mtime
+                size = os.stat(data).st_size if os.path.exists(data) else 0
+            except OSError:
+                continue
+            uploads.append((mtime, key, size))
+        uploads.sort()
+        return uploads
+
+    def sweep(self, keep=None):
+        """ Remove the expired uploads, then the ones used least recently
+        until the store is within its bounds, except the upload whose files
+        are named ``keep``."""
+        uploads = []
+        for mtime, key, size in self.scan():
+            if key != keep and self.expired(mtime):
+                self.remove(key)
+                self.count("expirations")
+            else:
+                uploads.append((mtime, key, size))
+        total = sum(size for _, _, size in uploads)
+        count = len(uploads)
+        for mtime, key, size in uploads:
+            if (self.max_entries is None or count <= self.max_entries) and (
+                self.max_bytes is None or total <= self.max_bytes
+            ):
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            self.count("evictions")
+            total -= size
+            count -= 1
+
+    def clear(self):
+        for _, key, _ in self.scan():
+            self.remove(key)
+
+    def preview_url(self, uid):
+        return None
+
+    def stats(self):
+        self.sweep()
+        uploads = self.scan()
+        with self.lock:
+            return {
+                "entries": len(uploads),
+                "bytes": sum(size for _, _, size in uploads),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SessionTmpStore(object):
+    """ A view of the upload store ``store`` giving each session a
+    namespace of its own, so that the uploads of one user are neither seen
+    nor cleared by another.
+
+    The namespace is a random identifier kept in the session of the
+    current request (or ``"global"`` outside of a request), prefixed to
+    the ``uid`` of each upload.  :meth:`clear` forgets the uploads of the
+    current session in constant time by giving it a new namespace; the
+    uploads left behind are reclaimed by the bounds of ``store``.  The view
+    holds no state of its own, so it is as thread safe as ``store`` and
+    works across processes with a shared ``store``."""
+
+    session_key = "deformdemo.tmpstore"
+
+    def __init__(self, store, get_request=get_current_request):
+        self.store = store
+        self.get_request = get_request
+
+    def namespace(self):
+        request = self.get_request()
+        if request is None:
+            return "global"
+        session = request.session
+        namespace = session.get(self.session_key)
+        if namespace is None:
+            namespace = session[self.session_key] = uuid.uuid4().hex
+        return namespace
+
+    def qualify(self, uid):
+        return "%s-%s" % (self.namespace(), uid)
+
+    def __getitem__(self, uid):
+        return self.store[self.qualify(uid)]
+
+    def get(self, uid, default=None):
+        return self.store.get(self.qualify(uid), default)
+
+    def __setitem__(self, uid, value):
+        self.store[self.qualify(uid)] = value
+
+    def __delitem__(self, uid):
+        del self.store[self.qualify(uid)]
+
+    def __contains__(self, uid):
+        return self.qualify(uid) in self.store
+
+    def clear(self):
+        request = self.get_request()
+        if request is None:
+            return
+        if self.session_key in request.session:
+            request.session[self.session_key] = uuid.uuid4().hex
+
+    def preview_url(self, uid):
+        return self.store.preview_url(self.qualify(uid))
+
+    def stats(self):
+        return self.store.stats()
+
+
+def make_tmpstore(settings):
+    """ Return the store of uploaded files configured by the
+    ``deformdemo.tmpstore_*`` settings: a :class:`FileSystemTmpStore` if
+    ``shared_dir`` is set, a :class:`SpooledTmpStore` otherwise, seen
+    through a :class:`SessionTmpStore` unless ``per_session`` is false.
+    Bounds of 0 are no bounds."""
+    kw = {}
+    for name, default in (
+        ("max_entries", 1000),
+        ("max_bytes", 64 * 1024 * 1024),
+        ("ttl", 3600),
+    ):
+        value = int(settings.get("deformdemo.tmpstore_" + name, default))
+        kw[name] = value or None
+    shared = settings.get("deformdemo.tmpstore_shared_dir")
+    if shared:
+        store = FileSystemTmpStore(shared, **kw)
+    else:
+        threshold = int(
+            settings.get("deformdemo.tmpstore_spool_threshold", 1024 * 1024)
+        )
+        store = SpooledTmpStore(
+            directory=settings.get("deformdemo.tmpstore_spool_dir") or None,
+            threshold=threshold or None,
+            **kw
+        )
+    if asbool(settings.get("deformdemo.tmpstore_per_session", True)):
+        store = SessionTmpStore(store)
+    return store
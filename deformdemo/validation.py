@@ -102,7 +102,7 @@ class FunctionalTests(unittest.TestCase):
         errors = []
         demos_urls = self.demos.get_demos()
         for demo in demos_urls:
-            res = self.testapp.get(demo[1], status=200)
+            res = self.testapp.get("/" + demo[2], status=200)
             check = validate(res.body)
             # import pdb; pdb.set_trace()  # NOQA
             try:
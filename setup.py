@@ -33,7 +33,7 @@ PY3 = sys.version_info[0] == 3
 
 requires = [
     "deform>=2.0dev",
-    "pyramid>=1.5a1",  # route_name argument to resource_url
+    "pyramid>=1.6",  # cache busters
     "pyramid_chameleon",
     "pygments",
     "six",
@@ -80,11 +80,17 @@ setupkw = dict(
             "readme_renderer",
         ],
         "testing": ["nose", "nose-selecttests", "selenium<3.0"],
+        "brotli": ["brotli"],
+        "minify": ["rcssmin", "rjsmin"],
     },
     entry_points="""\
     [paste.app_factory]
     demo = deformdemo:main
     mini= deformdemo.mini:main
+    [console_scripts]
+    deformdemo_compress_static = deformdemo.scripts.compress_static:main
+    deformdemo_benchmark = deformdemo.scripts.benchmark:main
+    deformdemo_load = deformdemo.scripts.loadtest:main
     """,
     message_extractors={
         ".": [("**.py", "lingua_python", None), ("**.pt", "lingua_xml", None)]